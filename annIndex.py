@@ -0,0 +1,173 @@
+import os
+import json
+import time
+import numpy as np
+from neo4j import GraphDatabase
+from pydantic import ConfigDict
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from embeddingCompression import normalize_rows, quantize_vectors, dequantize_vectors, metadata_projection
+
+# IVF snapshot per vector index: vectors are grouped by their nearest centroid so a query only scans a few lists
+DEFAULT_ANN_DIR = os.environ.get("ANN_INDEX_DIR", "cache/ann")
+TRAINING_SAMPLE_SIZE = 20000
+
+
+def train_centroids(matrix, n_clusters, iterations=10, seed=0):
+    # Spherical k-means on normalized vectors, trained on a sample for large corpora
+    rng = np.random.default_rng(seed)
+    if len(matrix) > TRAINING_SAMPLE_SIZE:
+        matrix = matrix[rng.choice(len(matrix), TRAINING_SAMPLE_SIZE, replace=False)]
+    centroids = matrix[rng.choice(len(matrix), n_clusters, replace=False)].copy()
+
+    for _ in range(iterations):
+        assignments = np.argmax(matrix @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, matrix)
+        filled = np.bincount(assignments, minlength=n_clusters) > 0
+        centroids[filled] = normalize_rows(sums[filled])
+    return centroids.astype(np.float32)
+
+
+class IVFIndex:
+    # Inverted-file index; vectors are stored sorted by list so each probe is a contiguous slice of the memmap
+
+    def __init__(self, centroids, offsets, order, codes, scales=None):
+        self.centroids = centroids
+        self.offsets = offsets
+        self.order = order
+        self.codes = codes
+        self.scales = scales
+
+    @classmethod
+    def build(cls, matrix, n_lists=None, dtype='float16', iterations=10):
+        matrix = normalize_rows(np.asarray(matrix, dtype=np.float32))
+        n_lists = n_lists or max(1, int(np.sqrt(len(matrix))))
+        n_lists = min(n_lists, len(matrix))
+
+        centroids = train_centroids(matrix, n_lists, iterations)
+        assignments = np.argmax(matrix @ centroids.T, axis=1)
+        order = np.argsort(assignments, kind='stable')
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(assignments, minlength=n_lists))])
+        codes, scales = quantize_vectors(matrix[order], dtype)
+        return cls(centroids, offsets, order, codes, scales)
+
+    def search(self, query_vector, k, n_probe=16):
+        # Returns (row positions in the original order, cosine scores), best first
+        query_vector = normalize_rows(np.asarray([query_vector], dtype=np.float32))[0]
+        n_probe = min(n_probe, len(self.centroids))
+        probes = np.argpartition(-(self.centroids @ query_vector), n_probe - 1)[:n_probe]
+
+        candidates = np.concatenate([np.arange(self.offsets[probe], self.offsets[probe + 1]) for probe in probes])
+        if len(candidates) == 0:
+            return np.array([], dtype=np.int64), np.array([], dtype=np.float32)
+        scales = self.scales[candidates] if self.scales is not None else None
+        scores = dequantize_vectors(np.asarray(self.codes[candidates]), scales) @ query_vector
+
+        k = min(k, len(candidates))
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        return self.order[candidates[best]], scores[best]
+
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, "centroids.npy"), self.centroids)
+        np.save(os.path.join(path, "offsets.npy"), self.offsets)
+        np.save(os.path.join(path, "order.npy"), self.order)
+        np.save(os.path.join(path, "codes.npy"), self.codes)
+        if self.scales is not None:
+            np.save(os.path.join(path, "scales.npy"), self.scales)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        mmap_mode = 'r' if mmap else None
+        scales_path = os.path.join(path, "scales.npy")
+        return cls(
+            np.load(os.path.join(path, "centroids.npy")),
+            np.load(os.path.join(path, "offsets.npy")),
+            np.load(os.path.join(path, "order.npy"), mmap_mode=mmap_mode),
+            np.load(os.path.join(path, "codes.npy"), mmap_mode=mmap_mode),
+            np.load(scales_path, mmap_mode=mmap_mode) if os.path.exists(scales_path) else None,
+        )
+
+
+def snapshot_path(index_name, ann_dir=DEFAULT_ANN_DIR):
+    return os.path.join(ann_dir, index_name)
+
+def read_index_documents(tx, label):
+    # Same text and metadata the Neo4j retrieval query returns
+    query = f"""
+    MATCH (ve:{label})
+    WHERE ve.embedding IS NOT NULL
+    RETURN ve.text_chunk AS text, ve.embedding AS embedding,
+           {metadata_projection('ve')} AS metadata
+    """
+
+    texts, vectors, metadatas = [], [], []
+    for record in tx.run(query):
+        texts.append(record['text'])
+        vectors.append(record['embedding'])
+        metadatas.append(record['metadata'])
+    return texts, np.asarray(vectors, dtype=np.float32), metadatas
+
+def build_ann_snapshot(index_name="failure_mode_context_index", label='VectorEmbedding', n_lists=None, dtype='float16', ann_dir=DEFAULT_ANN_DIR):
+    # Exports the stored embeddings of one vector index into an on-disk IVF snapshot
+    driver = GraphDatabase.driver(
+        uri=os.environ["NEO4J_URI"],
+        auth=(os.environ["NEO4J_USERNAME"], os.environ["NEO4J_PASSWORD"])
+    )
+    with driver.session() as session:
+        texts, matrix, metadatas = session.execute_read(read_index_documents, label)
+    driver.close()
+
+    if len(texts) == 0:
+        print(f"No embeddings found on {label} nodes")
+        return None
+
+    start_time = time.perf_counter()
+    index = IVFIndex.build(matrix, n_lists, dtype)
+    path = snapshot_path(index_name, ann_dir)
+    index.save(path)
+    with open(os.path.join(path, "documents.json"), 'w', encoding='utf-8') as documents_file:
+        json.dump({'index_name': index_name, 'label': label, 'dimension': int(matrix.shape[1]), 'dtype': dtype,
+                   'texts': texts, 'metadatas': metadatas}, documents_file, default=str)
+
+    print(f"ANN snapshot '{path}': {len(texts)} vectors in {len(index.centroids)} lists "
+          f"({dtype}, built in {time.perf_counter() - start_time:.1f}s)")
+    return path
+
+
+class ANNRetriever(BaseRetriever):
+    # Drop-in for the Neo4jVector retriever: embeds the query and searches the IVF snapshot in process
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    index: IVFIndex
+    embeddings: object
+    texts: list
+    metadatas: list
+    k: int = 10
+    n_probe: int = 16
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        rows, _ = self.index.search(self.embeddings.embed_query(query), self.k, self.n_probe)
+        return [Document(page_content=self.texts[row], metadata=self.metadatas[row]) for row in rows]
+
+
+_loaded_snapshots = {}
+
+def load_ann_snapshot(index_name, ann_dir=DEFAULT_ANN_DIR):
+    # Snapshots are memory mapped once per process and shared by every retriever
+    path = snapshot_path(index_name, ann_dir)
+    if path not in _loaded_snapshots:
+        if not os.path.exists(os.path.join(path, "documents.json")):
+            raise FileNotFoundError(f"No ANN snapshot for '{index_name}' in {ann_dir}, run build_ann_snapshot first")
+        with open(os.path.join(path, "documents.json"), encoding='utf-8') as documents_file:
+            documents = json.load(documents_file)
+        _loaded_snapshots[path] = (IVFIndex.load(path), documents)
+    return _loaded_snapshots[path]
+
+def get_ann_retriever(embeddings, index_name, k, n_probe=16, ann_dir=DEFAULT_ANN_DIR):
+    index, documents = load_ann_snapshot(index_name, ann_dir)
+    return ANNRetriever(index=index, embeddings=embeddings, texts=documents['texts'],
+                        metadatas=documents['metadatas'], k=k, n_probe=n_probe)
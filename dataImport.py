@@ -1,8 +1,764 @@
 import pandas as pd
 import os
+import re
+import csv
+import hashlib
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from neo4j import GraphDatabase
+from neo4j.exceptions import TransientError
+
+ENTITY_LABELS = {
+    'product': 'Product',
+    'subsystem': 'Subsystem',
+    'system_element': 'SystemElement',
+    'function': 'Function',
+    'failure_mode': 'FailureMode',
+    'failure_cause': 'FailureCause',
+    'failure_effect': 'FailureEffect',
+    'measure': 'Measure',
+}
+
+# relationship type -> (start label, end label, relationship properties)
+RELATIONSHIP_SPECS = {
+    'hasSubsystem': ('Product', 'Subsystem', []),
+    'hasSystemElement': ('Subsystem', 'SystemElement', []),
+    'hasFunction': ('SystemElement', 'Function', []),
+    'hasFailureMode': ('Function', 'FailureMode', []),
+    'resultsInFailureEffect': ('FailureMode', 'FailureEffect', []),
+    'isDueToFailureCause': ('FailureMode', 'FailureCause', ['detection_rating']),
+    'isImprovedByPreventiveMeasure': ('FailureCause', 'Measure', []),
+    'isImprovedByDetectiveMeasure': ('FailureCause', 'Measure', []),
+    'improvesDetectionFor': ('Measure', 'FailureMode', []),
+}
+
+# Uniqueness on id turns every MERGE/MATCH by id into an index seek instead of a label scan
+SCHEMA_CONSTRAINTS = {
+    f"{entity_type}_id_unique": f"CREATE CONSTRAINT {entity_type}_id_unique IF NOT EXISTS "
+                                f"FOR (n:{label}) REQUIRE n.id IS UNIQUE"
+    for entity_type, label in ENTITY_LABELS.items()
+}
+# label -> fulltext index over its names; the fuzzy lookups query one label each, so other labels cannot crowd
+# the wanted nodes out of the top hits
+NAME_FULLTEXT_INDEXES = {label: f"{entity_type}_name_fulltext" for entity_type, label in ENTITY_LABELS.items()}
+# Lookup indexes used by the embedding and retrieval queries
+SCHEMA_INDEXES = {
+    'vector_embedding_failure_mode_id': "CREATE INDEX vector_embedding_failure_mode_id IF NOT EXISTS "
+                                        "FOR (n:VectorEmbedding) ON (n.failure_mode_id)",
+    'failure_cause_chunk_failure_mode_id': "CREATE INDEX failure_cause_chunk_failure_mode_id IF NOT EXISTS "
+                                           "FOR (n:FailureCauseChunk) ON (n.failure_mode_id)",
+    'failure_effect_chunk_failure_mode_id': "CREATE INDEX failure_effect_chunk_failure_mode_id IF NOT EXISTS "
+                                            "FOR (n:FailureEffectChunk) ON (n.failure_mode_id)",
+    'measure_chunk_failure_mode_id': "CREATE INDEX measure_chunk_failure_mode_id IF NOT EXISTS "
+                                     "FOR (n:MeasureChunk) ON (n.failure_mode_id)",
+    # Normalized names for the graph retrieval lookups. The planner only uses a TEXT index for = when it knows the
+    # value is a string, which a parameter is not; the RANGE index serves = and STARTS WITH, the TEXT index CONTAINS
+    **{f"{entity_type}_name_lower_text": f"CREATE TEXT INDEX {entity_type}_name_lower_text IF NOT EXISTS "
+                                         f"FOR (n:{label}) ON (n.name_lower)"
+       for entity_type, label in ENTITY_LABELS.items()},
+    **{f"{entity_type}_name_lower_range": f"CREATE RANGE INDEX {entity_type}_name_lower_range IF NOT EXISTS "
+                                          f"FOR (n:{label}) ON (n.name_lower)"
+       for entity_type, label in ENTITY_LABELS.items()},
+    # Fuzzy name lookups of the graph retrieval (graphQuery lookup mode 'fuzzy')
+    **{index_name: f"CREATE FULLTEXT INDEX {index_name} IF NOT EXISTS FOR (n:{label}) ON EACH [n.name]"
+       for label, index_name in NAME_FULLTEXT_INDEXES.items()},
+    # Cross-label name search
+    'fulltext_entity_id': "CREATE FULLTEXT INDEX fulltext_entity_id IF NOT EXISTS "
+                          f"FOR (n:{'|'.join(ENTITY_LABELS.values())}) ON EACH [n.name]",
+}
+
+def name_lower_key(name):
+    # Must match toLower(n.name) set by clean_all_node_names on already trimmed names
+    return name.strip().lower() if isinstance(name, str) else name
+
+def read_nodes_missing_name_lower(tx, label):
+    query = f"""
+    MATCH (n:{label})
+    WHERE n.name IS NOT NULL AND (n.name_lower IS NULL OR n.name_lower <> toLower(n.name))
+    RETURN elementId(n) AS element_id
+    """
+    return [record['element_id'] for record in tx.run(query)]
+
+def set_name_lower_batch(tx, element_ids):
+    query = """
+    UNWIND $element_ids AS element_id
+    MATCH (n) WHERE elementId(n) = element_id
+    SET n.name_lower = toLower(n.name)
+    """
+    tx.run(query, element_ids=element_ids)
+
+def backfill_name_lower(session, batch_size=10000):
+    # For graphs imported before name_lower existed; the name lookups of graphQuery match nothing without it
+    updated_total = 0
+    for label in ENTITY_LABELS.values():
+        element_ids = session.execute_read(read_nodes_missing_name_lower, label)
+        for batch in iter_batches(element_ids, batch_size):
+            session.execute_write(set_name_lower_batch, batch)
+            updated_total += len(batch)
+        if element_ids:
+            print(f"Set name_lower on {len(element_ids)} {label} nodes")
+    return updated_total
+
+def migrate_name_lookups(batch_size=10000):
+    # Standalone migration of an existing graph: name_lower, its TEXT indexes and the fulltext index
+    driver = GraphDatabase.driver(
+        uri=os.environ["NEO4J_URI"],
+        auth=(os.environ["NEO4J_USERNAME"], os.environ["NEO4J_PASSWORD"])
+    )
+    try:
+        with driver.session() as session:
+            updated = backfill_name_lower(session, batch_size)
+            bootstrap_schema(session)
+            problems = verify_schema(session)
+    finally:
+        driver.close()
+    print(f"Backfilled name_lower on {updated} nodes")
+    return problems
+
+def bootstrap_schema(session):
+    # Idempotent, safe to run before every import
+    for statement in list(SCHEMA_CONSTRAINTS.values()) + list(SCHEMA_INDEXES.values()):
+        session.run(statement).consume()
+    session.run("CALL db.awaitIndexes(300)").consume()
+
+def verify_schema(session):
+    constraints = {record['name'] for record in session.run("SHOW CONSTRAINTS YIELD name")}
+    indexes = {record['name']: record['state'] for record in session.run("SHOW INDEXES YIELD name, state")}
+
+    problems = []
+    for name in SCHEMA_CONSTRAINTS:
+        if name not in constraints:
+            problems.append(f"missing constraint {name}")
+    for name in SCHEMA_INDEXES:
+        if name not in indexes:
+            problems.append(f"missing index {name}")
+        elif indexes[name] != 'ONLINE':
+            problems.append(f"index {name} is {indexes[name]}")
+    return problems
+
+# Relationships that span the subtree owned by a single product
+PRODUCT_SUBTREE_RELATIONSHIPS = "|".join(
+    [relationship_type for relationship_type in RELATIONSHIP_SPECS if relationship_type != 'improvesDetectionFor']
+    + ['HAS_EMBEDDING']
+)
+
+def delete_node_batch_any(tx, batch_size):
+    query = """
+    MATCH (n)
+    WITH n LIMIT $batch_size
+    DETACH DELETE n
+    RETURN count(*) AS deleted
+    """
+    return tx.run(query, batch_size=batch_size).single()['deleted']
+
+def read_product_subtree(tx, product_name):
+    query = f"""
+    MATCH (p:Product {{name: $product_name}})
+    OPTIONAL MATCH (p)-[:{PRODUCT_SUBTREE_RELATIONSHIPS}*]->(n)
+    WITH p, collect(DISTINCT n) AS subtree
+    UNWIND [p] + subtree AS n
+    RETURN DISTINCT elementId(n) AS element_id
+    """
+    return [record['element_id'] for record in tx.run(query, product_name=product_name)]
+
+def delete_element_batch(tx, element_ids):
+    query = """
+    UNWIND $element_ids AS element_id
+    MATCH (n)
+    WHERE elementId(n) = element_id
+    DETACH DELETE n
+    """
+    tx.run(query, element_ids=element_ids)
+
+def reset_graph_in_batches(session, batch_size=10000, product_name=None):
+    # Each batch is its own transaction, so transaction memory stays bounded on large graphs
+    deleted_total = 0
+    if product_name is None:
+        while True:
+            deleted = session.execute_write(delete_node_batch_any, batch_size)
+            if deleted == 0:
+                break
+            deleted_total += deleted
+            print(f"Deleted {deleted_total} nodes")
+        return deleted_total
+
+    # Nodes are keyed below their system element, so a product's subtree is never shared with another product
+    element_ids = session.execute_read(read_product_subtree, product_name)
+    for batch in iter_batches(element_ids, batch_size):
+        session.execute_write(delete_element_batch, batch)
+        deleted_total += len(batch)
+        print(f"Deleted {deleted_total}/{len(element_ids)} nodes of product '{product_name}'")
+    return deleted_total
+
+def build_entity_keys(cleaned_row):
+    # Natural key chain per entity, shared by all import modes
+    product_key = cleaned_row['product']
+    subsystem_key = f"{product_key}_{cleaned_row['subsystem']}"
+    system_element_key = f"{subsystem_key}_{cleaned_row['system_element']}"
+    return {
+        'product': product_key,
+        'subsystem': subsystem_key,
+        'system_element': system_element_key,
+        'function': f"{system_element_key}_{cleaned_row['function']}",
+        'failure_mode': f"{system_element_key}_{cleaned_row['failure_mode']}",
+        'failure_effect': f"{system_element_key}_{cleaned_row['failure_effect']}",
+        'failure_cause': f"{system_element_key}_{cleaned_row['failure_cause']}",
+        # Measures are unique per name and type
+        'measure': f"{system_element_key}_{cleaned_row['measure_name']}_{cleaned_row['measure_type']}",
+    }
+
+def hash_entity_id(entity_type, entity_key):
+    # Deterministic across runs and machines; 60 bits keep it a positive Neo4j integer
+    digest = hashlib.sha1(f"{entity_type}:{entity_key}".encode('utf-8')).hexdigest()
+    return int(digest[:15], 16)
+
+def new_graph_model(current_graph_model=None, id_strategy='sequential'):
+    graph_model = {
+        'id_strategy': id_strategy,
+        'entity_counters': {entity_type: 0 for entity_type in ENTITY_LABELS},
+        'existing_entities': {entity_type: {} for entity_type in ENTITY_LABELS},
+        # IDs already used in the database, reused for unchanged natural keys (delta import)
+        'known_ids': {entity_type: {} for entity_type in ENTITY_LABELS},
+        'nodes': {label: {} for label in ENTITY_LABELS.values()},
+        'relationships': {relationship_type: {} for relationship_type in RELATIONSHIP_SPECS},
+    }
+    if current_graph_model is not None:
+        for entity_type in ENTITY_LABELS:
+            graph_model['known_ids'][entity_type] = dict(current_graph_model['existing_entities'][entity_type])
+            graph_model['entity_counters'][entity_type] = current_graph_model['entity_counters'][entity_type]
+    return graph_model
+
+def assign_entity_id(graph_model, entity_type, entity_key):
+    entity_id = graph_model['known_ids'][entity_type].get(entity_key)
+    if entity_id is None:
+        graph_model['entity_counters'][entity_type] += 1
+        if graph_model['id_strategy'] == 'hash':
+            entity_id = hash_entity_id(entity_type, entity_key)
+        else:
+            entity_id = graph_model['entity_counters'][entity_type]
+    return entity_id
+
+def build_node_properties(entity_type, entity_id, cleaned_row):
+    if entity_type == 'measure':
+        return {'id': entity_id, 'name': cleaned_row['measure_name'],
+                'name_lower': name_lower_key(cleaned_row['measure_name']), 'type': cleaned_row['measure_type']}
+    properties = {'id': entity_id, 'name': cleaned_row[entity_type], 'name_lower': name_lower_key(cleaned_row[entity_type])}
+    if entity_type == 'failure_effect':
+        properties['severity_rating'] = cleaned_row['severity']
+    elif entity_type == 'failure_cause':
+        properties['occurrence_rating'] = cleaned_row['occurrence']
+    return properties
+
+def add_relationship_to_graph_model(graph_model, relationship_type, start_id, end_id, **properties):
+    relationship_key = (start_id, end_id) + tuple(properties.values())
+    graph_model['relationships'][relationship_type][relationship_key] = {
+        'start_id': start_id,
+        'end_id': end_id,
+        **properties
+    }
+
+def add_row_to_graph_model(graph_model, cleaned_row):
+    # Same deduplication as the row-by-row import, but collected in memory instead of written per row
+    entity_keys = build_entity_keys(cleaned_row)
+    ids = {}
+    for entity_type, entity_key in entity_keys.items():
+        known_entities = graph_model['existing_entities'][entity_type]
+        if entity_key not in known_entities:
+            entity_id = assign_entity_id(graph_model, entity_type, entity_key)
+            known_entities[entity_key] = entity_id
+            graph_model['nodes'][ENTITY_LABELS[entity_type]][entity_id] = build_node_properties(
+                entity_type, entity_id, cleaned_row)
+        ids[entity_type] = known_entities[entity_key]
+
+    add_relationship_to_graph_model(graph_model, 'hasSubsystem', ids['product'], ids['subsystem'])
+    add_relationship_to_graph_model(graph_model, 'hasSystemElement', ids['subsystem'], ids['system_element'])
+    add_relationship_to_graph_model(graph_model, 'hasFunction', ids['system_element'], ids['function'])
+    add_relationship_to_graph_model(graph_model, 'hasFailureMode', ids['function'], ids['failure_mode'])
+    add_relationship_to_graph_model(graph_model, 'resultsInFailureEffect', ids['failure_mode'], ids['failure_effect'])
+    add_relationship_to_graph_model(graph_model, 'isDueToFailureCause', ids['failure_mode'], ids['failure_cause'],
+                                    detection_rating=cleaned_row['detection'])
+    if cleaned_row['measure_type'] == 'preventive':
+        add_relationship_to_graph_model(graph_model, 'isImprovedByPreventiveMeasure', ids['failure_cause'], ids['measure'])
+    else:
+        add_relationship_to_graph_model(graph_model, 'isImprovedByDetectiveMeasure', ids['failure_cause'], ids['measure'])
+        add_relationship_to_graph_model(graph_model, 'improvesDetectionFor', ids['measure'], ids['failure_mode'])
+    return ids
+
+NAME_COLUMNS = ['product', 'subsystem', 'system_element', 'function',
+                'failure_mode', 'failure_effect', 'failure_cause', 'measure_name']
+ROW_COLUMNS = NAME_COLUMNS + ['measure_type', 'severity', 'occurrence', 'detection']
+
+def normalize_name_columns(chunk):
+    # Vectorized equivalent of clean_name: collapse all whitespace runs and trim.
+    # Empty cells become '' instead of NaN, which would end up as a float name and never compare equal in delta runs
+    for column in NAME_COLUMNS:
+        chunk[column] = chunk[column].fillna('').astype(str).str.replace(r'\s+', ' ', regex=True).str.strip()
+    return chunk
+
+def drop_rows_with_empty_names(chunk):
+    # Every name is part of an entity key, so a row with an empty name cannot be placed in the hierarchy
+    complete = (chunk[NAME_COLUMNS] != '').all(axis=1)
+    if not complete.all():
+        print(f"Skipped {int((~complete).sum())} rows with empty name cells")
+    return chunk[complete]
+
+def iter_cleaned_row_batches(csv_file_path, chunk_size=10000):
+    # Stream the CSV in chunks so memory does not grow with the file size
+    reader = pd.read_csv(
+        csv_file_path,
+        sep=';',
+        encoding='utf-8',
+        quotechar='"',
+        on_bad_lines='warn',
+        engine='c',
+        skipinitialspace=True,
+        doublequote=True,
+        chunksize=chunk_size
+    )
+    for chunk in reader:
+        yield drop_rows_with_empty_names(normalize_name_columns(chunk))[ROW_COLUMNS].to_dict('records')
+
+def build_graph_model_from_csv(csv_file_path, chunk_size=10000, current_graph_model=None, id_strategy='sequential'):
+    graph_model = new_graph_model(current_graph_model, id_strategy)
+    row_count = 0
+    for cleaned_rows in iter_cleaned_row_batches(csv_file_path, chunk_size):
+        for cleaned_row in cleaned_rows:
+            add_row_to_graph_model(graph_model, cleaned_row)
+        row_count += len(cleaned_rows)
+    return graph_model, row_count
+
+def flush_graph_model(graph_model):
+    # Drop rows that have been written, keep the key -> id maps for deduplication
+    for nodes in graph_model['nodes'].values():
+        nodes.clear()
+    for relationships in graph_model['relationships'].values():
+        relationships.clear()
+
+def partition_rows(csv_file_path, partition_by='product', chunk_size=10000):
+    # Subtrees of different products (or product+subsystem pairs) never share nodes in the key scheme,
+    # except for the Product node itself, which gets a global id here
+    partitions = {}
+    product_ids = {}
+    for cleaned_rows in iter_cleaned_row_batches(csv_file_path, chunk_size):
+        for cleaned_row in cleaned_rows:
+            product_ids.setdefault(cleaned_row['product'], len(product_ids) + 1)
+            if partition_by == 'subsystem':
+                partition_key = (cleaned_row['product'], cleaned_row['subsystem'])
+            else:
+                partition_key = (cleaned_row['product'],)
+            partitions.setdefault(partition_key, []).append(cleaned_row)
+    return partitions, product_ids
+
+def offset_graph_model_ids(graph_model, offsets):
+    # Shift the partition-local ids into the id range reserved for this partition
+    label_offsets = {ENTITY_LABELS[entity_type]: offset for entity_type, offset in offsets.items()}
+    for label, nodes in graph_model['nodes'].items():
+        graph_model['nodes'][label] = {
+            entity_id + label_offsets[label]: {**properties, 'id': entity_id + label_offsets[label]}
+            for entity_id, properties in nodes.items()
+        }
+    for relationship_type, relationships in graph_model['relationships'].items():
+        start_label, end_label, property_names = RELATIONSHIP_SPECS[relationship_type]
+        shifted = {}
+        for row in relationships.values():
+            start_id = row['start_id'] + label_offsets[start_label]
+            end_id = row['end_id'] + label_offsets[end_label]
+            properties = {name: row[name] for name in property_names}
+            shifted[(start_id, end_id) + tuple(properties.values())] = {
+                'start_id': start_id, 'end_id': end_id, **properties}
+        graph_model['relationships'][relationship_type] = shifted
+    for entity_type, offset in offsets.items():
+        known_entities = graph_model['existing_entities'][entity_type]
+        for entity_key in known_entities:
+            known_entities[entity_key] += offset
+    return graph_model
+
+def build_partitioned_graph_models(partitions, product_ids, id_strategy='sequential'):
+    if id_strategy == 'hash':
+        # Hashed ids are collision-free by construction, no id ranges needed
+        product_ids = {product: hash_entity_id('product', product) for product in product_ids}
+    shared_graph_model = new_graph_model(id_strategy=id_strategy)
+    shared_graph_model['entity_counters']['product'] = len(product_ids)
+    for product, product_id in product_ids.items():
+        shared_graph_model['nodes']['Product'][product_id] = {'id': product_id, 'name': product,
+                                                              'name_lower': name_lower_key(product)}
+
+    offsets = {entity_type: 0 for entity_type in ENTITY_LABELS}
+    partition_models = {}
+    for partition_key, cleaned_rows in partitions.items():
+        graph_model = new_graph_model(id_strategy=id_strategy)
+        graph_model['known_ids']['product'] = product_ids
+        for cleaned_row in cleaned_rows:
+            add_row_to_graph_model(graph_model, cleaned_row)
+
+        if id_strategy != 'hash':
+            partition_offsets = {entity_type: offset for entity_type, offset in offsets.items() if entity_type != 'product'}
+            partition_offsets['product'] = 0
+            offset_graph_model_ids(graph_model, partition_offsets)
+        for entity_type in ENTITY_LABELS:
+            if entity_type != 'product':
+                offsets[entity_type] += graph_model['entity_counters'][entity_type]
+                shared_graph_model['entity_counters'][entity_type] += graph_model['entity_counters'][entity_type]
+
+        # Product nodes are written before and hasSubsystem relationships after the partitions,
+        # so concurrent partitions never lock the same node
+        graph_model['nodes']['Product'] = {}
+        shared_graph_model['relationships']['hasSubsystem'].update(graph_model['relationships']['hasSubsystem'])
+        graph_model['relationships']['hasSubsystem'] = {}
+        partition_models[partition_key] = graph_model
+
+    return shared_graph_model, partition_models
+
+def write_graph_model_with_retry(driver, graph_model, batch_size=1000, max_retries=5):
+    # execute_write already retries single transactions; this retries the whole partition if a
+    # deadlock outlives that, which is safe because every write is an idempotent MERGE
+    for attempt in range(1, max_retries + 1):
+        try:
+            with driver.session() as session:
+                return write_graph_model(session, graph_model, batch_size)
+        except TransientError as e:
+            if attempt == max_retries:
+                raise
+            wait_time = 2 ** attempt * 0.1
+            print(f"Transient error ({e.code}), retrying partition in {wait_time:.1f}s (attempt {attempt}/{max_retries})")
+            time.sleep(wait_time)
+
+def count_label_nodes(tx, label):
+    return tx.run(f"MATCH (n:{label}) RETURN count(n) AS count").single()['count']
+
+def count_relationships(tx, relationship_type):
+    return tx.run(f"MATCH ()-[r:{relationship_type}]->() RETURN count(r) AS count").single()['count']
+
+def check_import_consistency(session, entity_counters, relationship_counts):
+    problems = []
+    for entity_type, label in ENTITY_LABELS.items():
+        stored = session.execute_read(count_label_nodes, label)
+        if stored != entity_counters[entity_type]:
+            problems.append(f"{label}: {stored} nodes in database, expected {entity_counters[entity_type]}")
+    for relationship_type, expected in relationship_counts.items():
+        stored = session.execute_read(count_relationships, relationship_type)
+        if stored != expected:
+            problems.append(f"{relationship_type}: {stored} relationships in database, expected {expected}")
+    return problems
+
+def iter_batches(items, batch_size):
+    for start in range(0, len(items), batch_size):
+        yield items[start:start + batch_size]
+
+def merge_node_batch(tx, label, rows):
+    query = f"""
+    UNWIND $rows AS row
+    MERGE (n:{label} {{id: row.id}})
+    SET n += row
+    """
+    tx.run(query, rows=rows)
+
+def merge_relationship_batch(tx, relationship_type, rows):
+    start_label, end_label, properties = RELATIONSHIP_SPECS[relationship_type]
+    property_map = ", ".join(f"{name}: row.{name}" for name in properties)
+    pattern = f"[:{relationship_type} {{{property_map}}}]" if properties else f"[:{relationship_type}]"
+    query = f"""
+    UNWIND $rows AS row
+    MATCH (a:{start_label} {{id: row.start_id}})
+    MATCH (b:{end_label} {{id: row.end_id}})
+    MERGE (a)-{pattern}->(b)
+    """
+    tx.run(query, rows=rows)
+
+def write_graph_model(session, graph_model, batch_size=1000):
+    # Nodes first so that every relationship batch can MATCH both endpoints
+    batch_count = 0
+    for label, nodes in graph_model['nodes'].items():
+        for batch in iter_batches(list(nodes.values()), batch_size):
+            session.execute_write(merge_node_batch, label, batch)
+            batch_count += 1
+    for relationship_type, relationships in graph_model['relationships'].items():
+        for batch in iter_batches(list(relationships.values()), batch_size):
+            session.execute_write(merge_relationship_batch, relationship_type, batch)
+            batch_count += 1
+    return batch_count
+
+# Rebuild the natural key chain of every stored entity from the hierarchy it hangs in
+SYSTEM_ELEMENT_PATH = "(p:Product)-[:hasSubsystem]->(s:Subsystem)-[:hasSystemElement]->(se:SystemElement)"
+ENTITY_KEY_QUERIES = {
+    'product': ("MATCH (n:Product)", "[n.name]"),
+    'subsystem': ("MATCH (p:Product)-[:hasSubsystem]->(n:Subsystem)", "[p.name, n.name]"),
+    'system_element': ("MATCH (p:Product)-[:hasSubsystem]->(s:Subsystem)-[:hasSystemElement]->(n:SystemElement)",
+                       "[p.name, s.name, n.name]"),
+    'function': (f"MATCH {SYSTEM_ELEMENT_PATH}-[:hasFunction]->(n:Function)",
+                 "[p.name, s.name, se.name, n.name]"),
+    'failure_mode': (f"MATCH {SYSTEM_ELEMENT_PATH}-[:hasFunction]->(:Function)-[:hasFailureMode]->(n:FailureMode)",
+                     "[p.name, s.name, se.name, n.name]"),
+    'failure_effect': (f"MATCH {SYSTEM_ELEMENT_PATH}-[:hasFunction]->(:Function)-[:hasFailureMode]->(:FailureMode)"
+                       "-[:resultsInFailureEffect]->(n:FailureEffect)",
+                       "[p.name, s.name, se.name, n.name]"),
+    'failure_cause': (f"MATCH {SYSTEM_ELEMENT_PATH}-[:hasFunction]->(:Function)-[:hasFailureMode]->(:FailureMode)"
+                      "-[:isDueToFailureCause]->(n:FailureCause)",
+                      "[p.name, s.name, se.name, n.name]"),
+    'measure': (f"MATCH {SYSTEM_ELEMENT_PATH}-[:hasFunction]->(:Function)-[:hasFailureMode]->(:FailureMode)"
+                "-[:isDueToFailureCause]->(:FailureCause)"
+                "-[:isImprovedByPreventiveMeasure|isImprovedByDetectiveMeasure]->(n:Measure)",
+                "[p.name, s.name, se.name, n.name, n.type]"),
+}
+
+def read_entity_keys(tx, entity_type):
+    match_clause, key_parts = ENTITY_KEY_QUERIES[entity_type]
+    query = f"""
+    {match_clause}
+    RETURN DISTINCT n.id AS id, {key_parts} AS key_parts
+    """
+    return [(record['id'], "_".join(str(part) for part in record['key_parts'])) for record in tx.run(query)]
+
+def read_label_nodes(tx, label):
+    query = f"""
+    MATCH (n:{label})
+    RETURN n.id AS id, properties(n) AS properties
+    """
+    return [(record['id'], record['properties']) for record in tx.run(query)]
+
+def read_relationships(tx, relationship_type):
+    start_label, end_label, properties = RELATIONSHIP_SPECS[relationship_type]
+    query = f"""
+    MATCH (a:{start_label})-[r:{relationship_type}]->(b:{end_label})
+    RETURN a.id AS start_id, b.id AS end_id, properties(r) AS properties
+    """
+    return [record.data() for record in tx.run(query)]
+
+def read_graph_model(session):
+    # Current FMEA graph in the same shape as new_graph_model(), keyed by natural keys
+    graph_model = new_graph_model()
+    for entity_type, label in ENTITY_LABELS.items():
+        for entity_id, properties in session.execute_read(read_label_nodes, label):
+            graph_model['nodes'][label][entity_id] = properties
+        # Nodes outside the hierarchy keep their id reserved and are deleted by the diff
+        if graph_model['nodes'][label]:
+            graph_model['entity_counters'][entity_type] = max(graph_model['nodes'][label])
+        for entity_id, entity_key in session.execute_read(read_entity_keys, entity_type):
+            graph_model['existing_entities'][entity_type].setdefault(entity_key, entity_id)
+
+    for relationship_type, (start_label, end_label, property_names) in RELATIONSHIP_SPECS.items():
+        for record in session.execute_read(read_relationships, relationship_type):
+            properties = {name: record['properties'].get(name) for name in property_names}
+            add_relationship_to_graph_model(graph_model, relationship_type,
+                                            record['start_id'], record['end_id'], **properties)
+    return graph_model
+
+def diff_graph_models(current_graph_model, desired_graph_model):
+    diff = {
+        'create_nodes': {label: [] for label in ENTITY_LABELS.values()},
+        'update_nodes': {label: [] for label in ENTITY_LABELS.values()},
+        'delete_nodes': {label: [] for label in ENTITY_LABELS.values()},
+        'create_relationships': {relationship_type: [] for relationship_type in RELATIONSHIP_SPECS},
+        'delete_relationships': {relationship_type: [] for relationship_type in RELATIONSHIP_SPECS},
+    }
+
+    for label in ENTITY_LABELS.values():
+        current_nodes = current_graph_model['nodes'][label]
+        desired_nodes = desired_graph_model['nodes'][label]
+        for entity_id, properties in desired_nodes.items():
+            if entity_id not in current_nodes:
+                diff['create_nodes'][label].append(properties)
+            elif any(current_nodes[entity_id].get(name) != value for name, value in properties.items()):
+                diff['update_nodes'][label].append(properties)
+        diff['delete_nodes'][label] = [entity_id for entity_id in current_nodes if entity_id not in desired_nodes]
+
+    for relationship_type in RELATIONSHIP_SPECS:
+        current_relationships = current_graph_model['relationships'][relationship_type]
+        desired_relationships = desired_graph_model['relationships'][relationship_type]
+        diff['create_relationships'][relationship_type] = [
+            row for key, row in desired_relationships.items() if key not in current_relationships]
+        diff['delete_relationships'][relationship_type] = [
+            row for key, row in current_relationships.items() if key not in desired_relationships]
+
+    return diff
+
+def failure_modes_by_entity(graph_model):
+    # FailureCause/FailureEffect/Measure id -> ids of the FailureModes whose context they are part of
+    relationships = graph_model['relationships']
+    failure_modes = {'FailureEffect': {}, 'FailureCause': {}, 'Measure': {}}
+    for row in relationships['resultsInFailureEffect'].values():
+        failure_modes['FailureEffect'].setdefault(row['end_id'], set()).add(row['start_id'])
+    for row in relationships['isDueToFailureCause'].values():
+        failure_modes['FailureCause'].setdefault(row['end_id'], set()).add(row['start_id'])
+    for relationship_type in ('isImprovedByPreventiveMeasure', 'isImprovedByDetectiveMeasure'):
+        for row in relationships[relationship_type].values():
+            failure_modes['Measure'].setdefault(row['end_id'], set()).update(
+                failure_modes['FailureCause'].get(row['start_id'], set()))
+    return failure_modes
+
+def find_changed_failure_modes(diff, current_graph_model, desired_graph_model):
+    # FailureModes whose own node or any of their causes, effects or measures changed
+    changed = set()
+    for row in diff['create_nodes']['FailureMode'] + diff['update_nodes']['FailureMode']:
+        changed.add(row['id'])
+
+    desired_failure_modes = failure_modes_by_entity(desired_graph_model)
+    for label in ('FailureEffect', 'FailureCause', 'Measure'):
+        for row in diff['update_nodes'][label]:
+            changed |= desired_failure_modes[label].get(row['id'], set())
+
+    current_failure_modes = failure_modes_by_entity(current_graph_model)
+    for change_type, failure_modes in (('create_relationships', desired_failure_modes),
+                                       ('delete_relationships', current_failure_modes)):
+        for relationship_type, rows in diff[change_type].items():
+            start_label, end_label, property_names = RELATIONSHIP_SPECS[relationship_type]
+            for row in rows:
+                if start_label == 'FailureMode':
+                    changed.add(row['start_id'])
+                elif end_label == 'FailureMode':
+                    changed.add(row['end_id'])
+                elif start_label == 'FailureCause':
+                    changed |= failure_modes['FailureCause'].get(row['start_id'], set())
+
+    deleted = set(diff['delete_nodes']['FailureMode'])
+    return sorted(changed - deleted), sorted(deleted)
+
+def delete_relationship_batch(tx, relationship_type, rows):
+    start_label, end_label, properties = RELATIONSHIP_SPECS[relationship_type]
+    property_map = ", ".join(f"{name}: row.{name}" for name in properties)
+    pattern = f"[r:{relationship_type} {{{property_map}}}]" if properties else f"[r:{relationship_type}]"
+    query = f"""
+    UNWIND $rows AS row
+    MATCH (a:{start_label} {{id: row.start_id}})-{pattern}->(b:{end_label} {{id: row.end_id}})
+    DELETE r
+    """
+    tx.run(query, rows=rows)
+
+def delete_node_batch(tx, label, ids):
+    # Embeddings of removed failure modes would otherwise be left behind as orphans
+    query = f"""
+    UNWIND $ids AS id
+    MATCH (n:{label} {{id: id}})
+    OPTIONAL MATCH (n)-[:HAS_EMBEDDING]->(ve)
+    DETACH DELETE n, ve
+    """
+    tx.run(query, ids=ids)
+
+def apply_graph_diff(session, diff, batch_size=1000):
+    for relationship_type, rows in diff['delete_relationships'].items():
+        for batch in iter_batches(rows, batch_size):
+            session.execute_write(delete_relationship_batch, relationship_type, batch)
+    for label, ids in diff['delete_nodes'].items():
+        for batch in iter_batches(ids, batch_size):
+            session.execute_write(delete_node_batch, label, batch)
+    for change_type in ('create_nodes', 'update_nodes'):
+        for label, rows in diff[change_type].items():
+            for batch in iter_batches(rows, batch_size):
+                session.execute_write(merge_node_batch, label, batch)
+    for relationship_type, rows in diff['create_relationships'].items():
+        for batch in iter_batches(rows, batch_size):
+            session.execute_write(merge_relationship_batch, relationship_type, batch)
+
+# Type annotations for neo4j-admin headers; integers match what the Cypher import stores
+ADMIN_CSV_PROPERTY_TYPES = {
+    'severity_rating': 'long',
+    'occurrence_rating': 'long',
+    'detection_rating': 'long',
+}
+
+def format_admin_csv_value(value):
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return ''
+    return str(value)
+
+def admin_csv_header(name):
+    if name in ADMIN_CSV_PROPERTY_TYPES:
+        return f"{name}:{ADMIN_CSV_PROPERTY_TYPES[name]}"
+    return name
+
+def export_graph_model_to_admin_csv(graph_model, output_dir):
+    # One file per label / relationship type, loadable with `neo4j-admin database import full --id-type=INTEGER`
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = {'nodes': {}, 'relationships': {}}
+
+    for label, nodes in graph_model['nodes'].items():
+        rows = list(nodes.values())
+        property_names = []
+        for row in rows:
+            for name in row:
+                if name != 'id' and name not in property_names:
+                    property_names.append(name)
+
+        file_path = os.path.join(output_dir, f"nodes_{label}.csv")
+        with open(file_path, 'w', newline='', encoding='utf-8') as csvfile:
+            writer = csv.writer(csvfile)
+            # Labels have separate ID spaces because every label has its own counter
+            writer.writerow([f"id:ID({label})"] + [admin_csv_header(name) for name in property_names])
+            for row in rows:
+                writer.writerow([row['id']] + [format_admin_csv_value(row.get(name)) for name in property_names])
+        manifest['nodes'][label] = {'file': file_path, 'count': len(rows)}
+
+    for relationship_type, relationships in graph_model['relationships'].items():
+        start_label, end_label, property_names = RELATIONSHIP_SPECS[relationship_type]
+        rows = list(relationships.values())
+
+        file_path = os.path.join(output_dir, f"relationships_{relationship_type}.csv")
+        with open(file_path, 'w', newline='', encoding='utf-8') as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow([f":START_ID({start_label})", f":END_ID({end_label})"]
+                            + [admin_csv_header(name) for name in property_names])
+            for row in rows:
+                writer.writerow([row['start_id'], row['end_id']]
+                                + [format_admin_csv_value(row.get(name)) for name in property_names])
+        manifest['relationships'][relationship_type] = {'file': file_path, 'count': len(rows)}
+
+    return manifest
+
+def build_admin_import_command(manifest, database="neo4j"):
+    arguments = ["neo4j-admin database import full", "--id-type=INTEGER"]
+    for label, entry in manifest['nodes'].items():
+        arguments.append(f"--nodes={label}={entry['file']}")
+    for relationship_type, entry in manifest['relationships'].items():
+        arguments.append(f"--relationships={relationship_type}={entry['file']}")
+    arguments.append(database)
+    return " \\\n    ".join(arguments)
+
+def validate_admin_csv_export(manifest, entity_counters):
+    # Re-read the generated files and compare them with the counts reported by the import
+    problems = []
+    ids_per_label = {}
+
+    for entity_type, label in ENTITY_LABELS.items():
+        with open(manifest['nodes'][label]['file'], newline='', encoding='utf-8') as csvfile:
+            reader = csv.reader(csvfile)
+            header = next(reader)
+            ids = [row[0] for row in reader]
+
+        if header[0] != f"id:ID({label})":
+            problems.append(f"{label}: unexpected id header '{header[0]}'")
+        if len(ids) != entity_counters[entity_type]:
+            problems.append(f"{label}: file has {len(ids)} nodes, import reported {entity_counters[entity_type]}")
+        if len(set(ids)) != len(ids):
+            problems.append(f"{label}: {len(ids) - len(set(ids))} duplicate ids")
+        ids_per_label[label] = set(ids)
+
+    for relationship_type, entry in manifest['relationships'].items():
+        start_label, end_label, property_names = RELATIONSHIP_SPECS[relationship_type]
+        with open(entry['file'], newline='', encoding='utf-8') as csvfile:
+            reader = csv.reader(csvfile)
+            next(reader)
+            rows = list(reader)
+
+        if len(rows) != entry['count']:
+            problems.append(f"{relationship_type}: file has {len(rows)} relationships, expected {entry['count']}")
+        dangling = sum(1 for row in rows
+                       if row[0] not in ids_per_label[start_label] or row[1] not in ids_per_label[end_label])
+        if dangling:
+            problems.append(f"{relationship_type}: {dangling} relationships reference unknown nodes")
+
+    return problems
+
+IMPORT_MODES = ('row', 'bulk', 'stream', 'parallel', 'admin_csv', 'delta')
+
+def data_upload_and_mapping_to_graph(csv_file_path="data/EngineBlockCleaned.csv", import_mode="row", batch_size=1000,
+                                     export_dir="data/admin_import", chunk_size=10000,
+                                     partition_by="product", max_workers=4, id_strategy="sequential",
+                                     reset_batch_size=10000, reset_product=None):
+    # Checked before connecting: the row path clears the whole database, so a mistyped mode must not fall through to it
+    if import_mode not in IMPORT_MODES:
+        raise ValueError(f"Unknown import mode '{import_mode}', expected one of {IMPORT_MODES}")
 
-def data_upload_and_mapping_to_graph():
     # Initialize Neo4j driver
     driver = GraphDatabase.driver(
         uri=os.environ["NEO4J_URI"],
@@ -28,15 +784,49 @@ def data_upload_and_mapping_to_graph():
                 session.run(f"DROP INDEX `{index['name']}` IF EXISTS")
         
         # Delete all data
-        session.run("MATCH (n) DETACH DELETE n")
+        reset_graph_in_batches(session, reset_batch_size)
+
+    def reset_database(session):
+        if reset_product is None:
+            clear_database_completely(session)
+            print("Database cleared.")
+            return
+        # Sequential ids of a re-imported product would collide with the ids of the products kept
+        if id_strategy != 'hash':
+            raise ValueError("reset_product requires id_strategy='hash'")
+        reset_graph_in_batches(session, reset_batch_size, reset_product)
+        print(f"Product '{reset_product}' cleared.")
+
+    def prepare_schema(session):
+        bootstrap_schema(session)
+        problems = verify_schema(session)
+        if problems:
+            print(f"Schema incomplete: {', '.join(problems)}")
+        else:
+            print("Schema constraints and indexes in place.")
 
     def clean_name(name):
         if name is None:
             return None
         cleaned = str(name).replace('\t', ' ').replace('\n', ' ').replace('\r', ' ')
-        import re
         cleaned = re.sub(r'\s+', ' ', cleaned).strip()
         return cleaned
+
+    def clean_row(row):
+        return {
+            'product': clean_name(row['product']),
+            'subsystem': clean_name(row['subsystem']),
+            'system_element': clean_name(row['system_element']),
+            'function': clean_name(row['function']),
+            'failure_mode': clean_name(row['failure_mode']),
+            'failure_effect': clean_name(row['failure_effect']),
+            'failure_cause': clean_name(row['failure_cause']),
+            'measure_name': clean_name(row['measure_name']),
+            'measure_type': row['measure_type'], 
+            'severity': row['severity'],
+            'occurrence': row['occurrence'],
+            'detection': row['detection']
+        }
         
     def clean_all_node_names(session):
         query = """
@@ -51,11 +841,177 @@ def data_upload_and_mapping_to_graph():
                 "\t", " "
             )
         )
+        SET n.name_lower = toLower(n.name)
         """
         session.run(query)
         print("Cleaned all node names in database")
+
+    def print_import_summary(entity_counters):
+        print(f"\nImport completed successfully!")
+        print(f"Created {entity_counters['product']} products")
+        print(f"Created {entity_counters['subsystem']} subsystems")
+        print(f"Created {entity_counters['system_element']} system elements")
+        print(f"Created {entity_counters['function']} functions")
+        print(f"Created {entity_counters['failure_mode']} failure modes")
+        print(f"Created {entity_counters['failure_cause']} failure causes")
+        print(f"Created {entity_counters['failure_effect']} failure effects")
+        print(f"Created {entity_counters['measure']} measures")
+
+    def import_fmea_data_bulk(csv_file_path):
+        # Build deduplicated nodes and relationships in memory, then write them with UNWIND batches
+        graph_model, row_count = build_graph_model_from_csv(csv_file_path, chunk_size, id_strategy=id_strategy)
+
+        node_count = sum(len(nodes) for nodes in graph_model['nodes'].values())
+        relationship_count = sum(len(relationships) for relationships in graph_model['relationships'].values())
+        print(f"Built {node_count} nodes and {relationship_count} relationships from {row_count} rows")
+
+        with driver.session() as session:
+            # Clear existing data
+            reset_database(session)
+            prepare_schema(session)
+
+            batch_count = write_graph_model(session, graph_model, batch_size)
+            print(f"Wrote graph in {batch_count} batches of up to {batch_size} rows")
+
+            clean_all_node_names(session)
+
+        print_import_summary(graph_model['entity_counters'])
+
+    def import_fmea_data_stream(csv_file_path):
+        # Write every CSV chunk as soon as it is parsed; only the key -> id maps are kept across chunks
+        graph_model = new_graph_model(id_strategy=id_strategy)
+        row_count = 0
+        batch_count = 0
+
+        with driver.session() as session:
+            # Clear existing data
+            reset_database(session)
+            prepare_schema(session)
+
+            for cleaned_rows in iter_cleaned_row_batches(csv_file_path, chunk_size):
+                for cleaned_row in cleaned_rows:
+                    add_row_to_graph_model(graph_model, cleaned_row)
+                batch_count += write_graph_model(session, graph_model, batch_size)
+                flush_graph_model(graph_model)
+                row_count += len(cleaned_rows)
+                print(f"Processed {row_count} rows")
+
+            print(f"Wrote graph in {batch_count} batches of up to {batch_size} rows")
+            clean_all_node_names(session)
+
+        print_import_summary(graph_model['entity_counters'])
+
+    def import_fmea_data_parallel(csv_file_path):
+        partitions, product_ids = partition_rows(csv_file_path, partition_by, chunk_size)
+        shared_graph_model, partition_models = build_partitioned_graph_models(partitions, product_ids, id_strategy)
+        print(f"Split {sum(len(rows) for rows in partitions.values())} rows into {len(partitions)} partitions by {partition_by}")
+
+        relationship_counts = {
+            relationship_type: len(shared_graph_model['relationships'][relationship_type])
+            + sum(len(graph_model['relationships'][relationship_type]) for graph_model in partition_models.values())
+            for relationship_type in RELATIONSHIP_SPECS
+        }
+
+        with driver.session() as session:
+            # Clear existing data
+            reset_database(session)
+            prepare_schema(session)
+
+            # Products first, partitions depend on them
+            write_graph_model(session, {'nodes': shared_graph_model['nodes'], 'relationships': {}}, batch_size)
+
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="import-partition") as executor:
+            futures = {
+                executor.submit(write_graph_model_with_retry, driver, graph_model, batch_size): partition_key
+                for partition_key, graph_model in partition_models.items()
+            }
+            for future in as_completed(futures):
+                print(f"Partition {' / '.join(futures[future])} written in {future.result()} batches")
+
+        with driver.session() as session:
+            write_graph_model(session, {'nodes': {}, 'relationships': shared_graph_model['relationships']}, batch_size)
+            clean_all_node_names(session)
+
+            # Counts only add up when the import owns the whole database
+            if reset_product is None:
+                problems = check_import_consistency(session, shared_graph_model['entity_counters'], relationship_counts)
+                if problems:
+                    print("Consistency check failed:")
+                    for problem in problems:
+                        print(f"  {problem}")
+                else:
+                    print("Consistency check passed.")
+
+        print_import_summary(shared_graph_model['entity_counters'])
+
+    def export_fmea_data_for_admin_import(csv_file_path):
+        # Offline path: no database writes, only header-annotated CSV files for neo4j-admin
+        graph_model, row_count = build_graph_model_from_csv(csv_file_path, chunk_size, id_strategy=id_strategy)
+
+        manifest = export_graph_model_to_admin_csv(graph_model, export_dir)
+        print(f"Wrote neo4j-admin import files to {export_dir}")
+
+        problems = validate_admin_csv_export(manifest, graph_model['entity_counters'])
+        if problems:
+            print("Validation of neo4j-admin import files failed:")
+            for problem in problems:
+                print(f"  {problem}")
+        else:
+            print("Validation of neo4j-admin import files passed.")
+            print("Load them into a stopped, empty database with:")
+            print(build_admin_import_command(manifest))
+
+        print_import_summary(graph_model['entity_counters'])
+        return manifest
+
+    def import_fmea_data_delta(csv_file_path):
+        # Diff against the stored graph instead of wiping it, so VectorEmbedding nodes survive
+        with driver.session() as session:
+            prepare_schema(session)
+            current_graph_model = read_graph_model(session)
+            desired_graph_model, row_count = build_graph_model_from_csv(
+                csv_file_path, chunk_size, current_graph_model, id_strategy)
+
+            diff = diff_graph_models(current_graph_model, desired_graph_model)
+            changed_failure_modes, deleted_failure_modes = find_changed_failure_modes(
+                diff, current_graph_model, desired_graph_model)
+            apply_graph_diff(session, diff, batch_size)
+
+        print("\nDelta import completed successfully!")
+        for label in ENTITY_LABELS.values():
+            created = len(diff['create_nodes'][label])
+            updated = len(diff['update_nodes'][label])
+            deleted = len(diff['delete_nodes'][label])
+            if created or updated or deleted:
+                print(f"{label}: {created} created, {updated} updated, {deleted} deleted")
+        for relationship_type in RELATIONSHIP_SPECS:
+            created = len(diff['create_relationships'][relationship_type])
+            deleted = len(diff['delete_relationships'][relationship_type])
+            if created or deleted:
+                print(f"{relationship_type}: {created} created, {deleted} deleted")
+        print(f"Changed failure modes: {len(changed_failure_modes)}, deleted failure modes: {len(deleted_failure_modes)}")
+
+        return {
+            'changed_failure_modes': changed_failure_modes,
+            'deleted_failure_modes': deleted_failure_modes,
+        }
         
     def import_fmea_data(csv_file_path):
+        if import_mode == 'bulk':
+            import_fmea_data_bulk(csv_file_path)
+            return
+        if import_mode == 'stream':
+            import_fmea_data_stream(csv_file_path)
+            return
+        if import_mode == 'parallel':
+            import_fmea_data_parallel(csv_file_path)
+            return
+        if import_mode == 'admin_csv':
+            export_fmea_data_for_admin_import(csv_file_path)
+            return
+        if import_mode == 'delta':
+            return import_fmea_data_delta(csv_file_path)
+
         df = pd.read_csv(
                 csv_file_path,
                 sep=';',                    
@@ -78,6 +1034,11 @@ def data_upload_and_mapping_to_graph():
             'measure': 0,
         }
         
+        def next_entity_id(entity_type, entity_key):
+            if id_strategy == 'hash':
+                return hash_entity_id(entity_type, entity_key)
+            return entity_counters[entity_type]
+
         # Track existing entities to avoid duplicates and ID conflicts
         existing_entities = {
             'product': {},
@@ -93,72 +1054,60 @@ def data_upload_and_mapping_to_graph():
         
         with driver.session() as session:
             # Clear existing data
-            clear_database_completely(session)
-            print("Database cleared.")
+            reset_database(session)
+            prepare_schema(session)
             
             for index, row in df.iterrows():
                 print(f"Processing row {index + 1}/{len(df)}")
                 
-                cleaned_row = {
-                    'product': clean_name(row['product']),
-                    'subsystem': clean_name(row['subsystem']),
-                    'system_element': clean_name(row['system_element']),
-                    'function': clean_name(row['function']),
-                    'failure_mode': clean_name(row['failure_mode']),
-                    'failure_effect': clean_name(row['failure_effect']),
-                    'failure_cause': clean_name(row['failure_cause']),
-                    'measure_name': clean_name(row['measure_name']),
-                    'measure_type': row['measure_type'], 
-                    'severity': row['severity'],
-                    'occurrence': row['occurrence'],
-                    'detection': row['detection']
-                }
+                cleaned_row = clean_row(row)
+                entity_keys = build_entity_keys(cleaned_row)
                 
                 # Create/get Product
-                product_key = cleaned_row['product']
+                product_key = entity_keys['product']
                 if product_key not in existing_entities['product']:
                     entity_counters['product'] += 1
-                    product_id = entity_counters['product']
+                    product_id = next_entity_id('product', product_key)
                     existing_entities['product'][product_key] = product_id
                     session.execute_write(create_product_node, product_id, cleaned_row['product'])
                 else:
                     product_id = existing_entities['product'][product_key]
                 
                 # Create/get Subsystem
-                subsystem_key = f"{product_key}_{cleaned_row['subsystem']}"
+                subsystem_key = entity_keys['subsystem']
                 if subsystem_key not in existing_entities['subsystem']:
                     entity_counters['subsystem'] += 1
-                    subsystem_id = entity_counters['subsystem']
+                    subsystem_id = next_entity_id('subsystem', subsystem_key)
                     existing_entities['subsystem'][subsystem_key] = subsystem_id
                     session.execute_write(create_subsystem_node, subsystem_id, cleaned_row['subsystem'], product_id)
                 else:
                     subsystem_id = existing_entities['subsystem'][subsystem_key]
                 
                 # Create/get SystemElement
-                system_element_key = f"{subsystem_key}_{cleaned_row['system_element']}"
+                system_element_key = entity_keys['system_element']
                 if system_element_key not in existing_entities['system_element']:
                     entity_counters['system_element'] += 1
-                    system_element_id = entity_counters['system_element']
+                    system_element_id = next_entity_id('system_element', system_element_key)
                     existing_entities['system_element'][system_element_key] = system_element_id
                     session.execute_write(create_system_element_node, system_element_id, cleaned_row['system_element'], subsystem_id)
                 else:
                     system_element_id = existing_entities['system_element'][system_element_key]
                 
                 # Create/get Function
-                function_key = f"{system_element_key}_{cleaned_row['function']}"
+                function_key = entity_keys['function']
                 if function_key not in existing_entities['function']:
                     entity_counters['function'] += 1
-                    function_id = entity_counters['function']
+                    function_id = next_entity_id('function', function_key)
                     existing_entities['function'][function_key] = function_id
                     session.execute_write(create_function_node, function_id, cleaned_row['function'], system_element_id)
                 else:
                     function_id = existing_entities['function'][function_key]
                 
                 # Create/get FailureMode
-                failure_mode_key = f"{system_element_key}_{cleaned_row['failure_mode']}"
+                failure_mode_key = entity_keys['failure_mode']
                 if failure_mode_key not in existing_entities['failure_mode']:
                     entity_counters['failure_mode'] += 1
-                    failure_mode_id = entity_counters['failure_mode']
+                    failure_mode_id = next_entity_id('failure_mode', failure_mode_key)
                     existing_entities['failure_mode'][failure_mode_key] = failure_mode_id
                     session.execute_write(create_failure_mode_node, failure_mode_id, cleaned_row['failure_mode'], function_id)
                 else:
@@ -166,10 +1115,10 @@ def data_upload_and_mapping_to_graph():
                     session.execute_write(create_failure_mode_function_relationship, function_id, failure_mode_id)
                 
                 # Create/get FailureEffect 
-                failure_effect_key = f"{system_element_key}_{cleaned_row['failure_effect']}"
+                failure_effect_key = entity_keys['failure_effect']
                 if failure_effect_key not in existing_entities['failure_effect']:
                     entity_counters['failure_effect'] += 1
-                    failure_effect_id = entity_counters['failure_effect']
+                    failure_effect_id = next_entity_id('failure_effect', failure_effect_key)
                     existing_entities['failure_effect'][failure_effect_key] = failure_effect_id
                     session.execute_write(create_failure_effect_node, failure_effect_id, cleaned_row['failure_effect'], 
                                         cleaned_row['severity'], failure_mode_id)
@@ -178,10 +1127,10 @@ def data_upload_and_mapping_to_graph():
                     session.execute_write(create_failure_mode_effect_relationship, failure_mode_id, failure_effect_id)
                 
                 # Create/get FailureCause
-                failure_cause_key = f"{system_element_key}_{cleaned_row['failure_cause']}"
+                failure_cause_key = entity_keys['failure_cause']
                 if failure_cause_key not in existing_entities['failure_cause']:
                     entity_counters['failure_cause'] += 1
-                    failure_cause_id = entity_counters['failure_cause']
+                    failure_cause_id = next_entity_id('failure_cause', failure_cause_key)
                     existing_entities['failure_cause'][failure_cause_key] = failure_cause_id
                     
                     session.execute_write(create_failure_cause_node, failure_cause_id, cleaned_row['failure_cause'], 
@@ -192,10 +1141,10 @@ def data_upload_and_mapping_to_graph():
                     session.execute_write(create_failure_mode_cause_relationship, failure_mode_id, failure_cause_id, cleaned_row['detection'])
                 
                 # Create/get Measure with type-specific uniqueness
-                measure_key = f"{system_element_key}_{cleaned_row['measure_name']}_{cleaned_row['measure_type']}"
+                measure_key = entity_keys['measure']
                 if measure_key not in existing_entities['measure']:
                     entity_counters['measure'] += 1
-                    measure_id = entity_counters['measure']
+                    measure_id = next_entity_id('measure', measure_key)
                     existing_entities['measure'][measure_key] = measure_id
                     session.execute_write(create_measure_node, measure_id, cleaned_row['measure_name'], 
                                         cleaned_row['measure_type'], failure_cause_id, failure_mode_id)
@@ -206,15 +1155,7 @@ def data_upload_and_mapping_to_graph():
                 
             clean_all_node_names(session)
                 
-        print(f"\nImport completed successfully!")
-        print(f"Created {entity_counters['product']} products")
-        print(f"Created {entity_counters['subsystem']} subsystems")
-        print(f"Created {entity_counters['system_element']} system elements")
-        print(f"Created {entity_counters['function']} functions")
-        print(f"Created {entity_counters['failure_mode']} failure modes")
-        print(f"Created {entity_counters['failure_cause']} failure causes")
-        print(f"Created {entity_counters['failure_effect']} failure effects")
-        print(f"Created {entity_counters['measure']} measures")
+        print_import_summary(entity_counters)
 
     
 
@@ -344,6 +1285,6 @@ def data_upload_and_mapping_to_graph():
 
 
 
-    csv_file_path = "data/EngineBlockCleaned.csv"
-    import_fmea_data(csv_file_path)
-    driver.close()
\ No newline at end of file
+    import_result = import_fmea_data(csv_file_path)
+    driver.close()
+    return import_result
\ No newline at end of file
@@ -0,0 +1,103 @@
+import os
+import re
+import hashlib
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from embeddingCache import CachedEmbeddings, QueryEmbeddingLRU, DEFAULT_QUERY_CACHE_SIZE
+
+# Selects the embedding model for indexing and retrieval; "hashing" needs no embedding server and is reproducible
+EMBEDDING_BACKEND = os.environ.get("FMEA_EMBEDDING_BACKEND", "ollama")
+EMBEDDING_MODEL = os.environ.get("FMEA_EMBEDDING_MODEL", "mxbai-embed-large")
+EMBEDDING_DIMENSION = int(os.environ.get("FMEA_EMBEDDING_DIMENSION", 1024))
+EMBEDDING_BACKENDS = ('ollama', 'hashing')
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+class HashingEmbeddings(Embeddings):
+    # Feature hashing of word unigrams and character trigrams: deterministic, with no model weights or network calls
+
+    def __init__(self, dimension=EMBEDDING_DIMENSION, seed=0):
+        self.dimension = dimension
+        self.seed = seed
+
+    def _features(self, text):
+        words = TOKEN_PATTERN.findall(text.lower())
+        features = [f"w:{word}" for word in words]
+        for word in words:
+            padded = f"#{word}#"
+            features.extend(f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2))
+        return features
+
+    def _embed(self, text):
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        for feature in self._features(text):
+            digest = hashlib.blake2b(f"{self.seed}:{feature}".encode('utf-8'), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:4], 'little') % self.dimension
+            vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector /= norm
+        return vector.tolist()
+
+    def embed_documents(self, texts):
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+    def embed_queries(self, texts):
+        return [self._embed(text) for text in texts]
+
+
+class OllamaQueryBatching(Embeddings):
+    # Gives the Ollama clients a query-side batch call: several queries go to the server in one embed request
+
+    def __init__(self, embeddings):
+        self.embeddings = embeddings
+
+    def embed_documents(self, texts):
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text):
+        return self.embeddings.embed_query(text)
+
+    def embed_queries(self, texts):
+        query_instruction = getattr(self.embeddings, 'query_instruction', None)
+        if query_instruction is not None:
+            # langchain_community prefixes queries and documents differently; embed_documents would apply the
+            # document instruction, so the query instruction is applied here and the texts are sent as they are
+            return self.embeddings._embed([f"{query_instruction}{text}" for text in texts])
+        # langchain_ollama embeds a query as a one-element embed_documents call
+        return self.embeddings.embed_documents(texts)
+
+
+def embedding_model_name(backend=None):
+    # Used as the embedding cache namespace, so vectors of different backends never mix
+    backend = backend or EMBEDDING_BACKEND
+    if backend == 'hashing':
+        return f"hashing-{EMBEDDING_DIMENSION}"
+    return EMBEDDING_MODEL
+
+def get_base_embeddings(backend=None):
+    backend = backend or EMBEDDING_BACKEND
+    if backend == 'ollama':
+        # Only the ollama backend needs the client library
+        try:
+            from langchain_ollama import OllamaEmbeddings
+        except ImportError:
+            from langchain_community.embeddings import OllamaEmbeddings
+        return OllamaQueryBatching(OllamaEmbeddings(model=EMBEDDING_MODEL))
+    if backend == 'hashing':
+        return HashingEmbeddings(EMBEDDING_DIMENSION)
+    raise ValueError(f"Unknown embedding backend '{backend}', expected one of {EMBEDDING_BACKENDS}")
+
+def get_embeddings(backend=None, cached=True, query_cache_size=DEFAULT_QUERY_CACHE_SIZE):
+    # cached persists every vector in the on-disk embedding cache; query_cache_size bounds the in-memory
+    # LRU of query embeddings in front of it (0 disables it)
+    embeddings = get_base_embeddings(backend)
+    if cached:
+        embeddings = CachedEmbeddings(embeddings, model_name=embedding_model_name(backend))
+    if query_cache_size:
+        embeddings = QueryEmbeddingLRU(embeddings, max_size=query_cache_size)
+    return embeddings
@@ -0,0 +1,396 @@
+import os
+import json
+import time
+import shutil
+import atexit
+import hashlib
+import threading
+import numpy as np
+from collections import OrderedDict
+from langchain_core.embeddings import Embeddings
+
+DEFAULT_CACHE_DIR = os.environ.get("EMBEDDING_CACHE_DIR", "cache/embeddings")
+DEFAULT_MAX_BYTES = int(os.environ.get("EMBEDDING_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+DEFAULT_QUERY_CACHE_SIZE = int(os.environ.get("QUERY_EMBEDDING_CACHE_SIZE", 4096))
+# New entries go to an append-only log; index.json is rewritten on flush or after this many logged entries
+INDEX_CHECKPOINT_ENTRIES = 1024
+
+def chunk_hash(text, kind="document"):
+    # Documents and queries are kept apart because some models embed them with different instructions
+    return hashlib.sha256(f"{kind}:{text}".encode('utf-8')).hexdigest()
+
+def model_directory_name(model_name):
+    return "".join(character if character.isalnum() or character in "-_." else "_" for character in model_name)
+
+
+class EmbeddingCache:
+    # Per model: vectors.f32 holds float32 rows back to back, index.json maps chunk hash -> [row, last_used]
+    # and entries.log holds the entries added since index.json was last written.
+    # Single process only: the files are guarded by a thread lock, not a file lock, so processes that embed
+    # concurrently need separate cache directories (EMBEDDING_CACHE_DIR)
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.indexes = {}
+        self.dirty_models = set()
+        self.logged_entries = {}
+        self.total_bytes = None
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        atexit.register(self.flush)
+
+    def _model_dir(self, model_name):
+        return os.path.join(self.cache_dir, model_directory_name(model_name))
+
+    def _load_index(self, model_name):
+        if model_name not in self.indexes:
+            model_dir = self._model_dir(model_name)
+            index_path = os.path.join(model_dir, "index.json")
+            if os.path.exists(index_path):
+                with open(index_path, encoding='utf-8') as index_file:
+                    index = json.load(index_file)
+            else:
+                index = {'model_name': model_name, 'dimension': None, 'rows': 0, 'entries': {}}
+
+            log_path = os.path.join(model_dir, "entries.log")
+            logged = 0
+            if os.path.exists(log_path):
+                with open(log_path, encoding='utf-8') as log_file:
+                    for line in log_file:
+                        parts = line.split()
+                        if len(parts) != 4:
+                            # Torn last line of an interrupted write
+                            continue
+                        hash_value, row, last_used, dimension = parts
+                        index['dimension'] = int(dimension)
+                        index['entries'][hash_value] = [int(row), float(last_used)]
+                        logged += 1
+
+            # Rows written without their index entries (interrupted put) stay unreferenced until compaction
+            vectors_path = os.path.join(model_dir, "vectors.f32")
+            if index['dimension'] and os.path.exists(vectors_path):
+                row_bytes = index['dimension'] * 4
+                file_rows = os.path.getsize(vectors_path) // row_bytes
+                if os.path.getsize(vectors_path) != file_rows * row_bytes:
+                    os.truncate(vectors_path, file_rows * row_bytes)
+                index['rows'] = file_rows
+                index['entries'] = {hash_value: entry for hash_value, entry in index['entries'].items()
+                                    if entry[0] < file_rows}
+
+            self.indexes[model_name] = index
+            self.logged_entries[model_name] = logged
+        return self.indexes[model_name]
+
+    def _save_index(self, model_name):
+        model_dir = self._model_dir(model_name)
+        os.makedirs(model_dir, exist_ok=True)
+        index_path = os.path.join(model_dir, "index.json")
+        with open(index_path + ".tmp", 'w', encoding='utf-8') as index_file:
+            json.dump(self.indexes[model_name], index_file)
+        os.replace(index_path + ".tmp", index_path)
+        # Everything in the log is now in index.json; replaying it again would be harmless
+        log_path = os.path.join(model_dir, "entries.log")
+        if os.path.exists(log_path):
+            os.remove(log_path)
+        self.logged_entries[model_name] = 0
+        self.dirty_models.discard(model_name)
+
+    def get_many(self, model_name, hashes):
+        with self.lock:
+            index = self._load_index(model_name)
+            rows = [index['entries'].get(hash_value) for hash_value in hashes]
+            found = [entry for entry in rows if entry is not None]
+            self.hits += len(found)
+            self.misses += len(rows) - len(found)
+            if not found:
+                return [None] * len(hashes)
+
+            vectors_path = os.path.join(self._model_dir(model_name), "vectors.f32")
+            matrix = np.memmap(vectors_path, dtype=np.float32, mode='r', shape=(index['rows'], index['dimension']))
+            now = time.time()
+            results = []
+            for entry in rows:
+                if entry is None:
+                    results.append(None)
+                else:
+                    entry[1] = now
+                    results.append(np.array(matrix[entry[0]]))
+            self.dirty_models.add(model_name)
+            return results
+
+    def put_many(self, model_name, hashes, vectors):
+        if not hashes:
+            return
+        matrix = np.asarray(vectors, dtype=np.float32)
+        with self.lock:
+            index = self._load_index(model_name)
+            if index['dimension'] is None:
+                index['dimension'] = int(matrix.shape[1])
+            elif index['dimension'] != matrix.shape[1]:
+                raise ValueError(f"Embedding dimension {matrix.shape[1]} does not match cached dimension {index['dimension']} for {model_name}")
+
+            model_dir = self._model_dir(model_name)
+            os.makedirs(model_dir, exist_ok=True)
+            size = self._size_bytes()
+            with open(os.path.join(model_dir, "vectors.f32"), 'ab') as vectors_file:
+                vectors_file.write(matrix.tobytes())
+            self.total_bytes = size + matrix.nbytes
+
+            # Vectors first, then their entries: a crash in between only leaves unreferenced rows
+            now = time.time()
+            log_lines = []
+            for offset, hash_value in enumerate(hashes):
+                index['entries'][hash_value] = [index['rows'] + offset, now]
+                log_lines.append(f"{hash_value} {index['rows'] + offset} {now} {index['dimension']}\n")
+            with open(os.path.join(model_dir, "entries.log"), 'a', encoding='utf-8') as log_file:
+                log_file.writelines(log_lines)
+            index['rows'] += len(hashes)
+            self.logged_entries[model_name] += len(hashes)
+            self.dirty_models.add(model_name)
+            # index.json also names the model of the directory, so it is written with the first entries
+            if (self.logged_entries[model_name] >= INDEX_CHECKPOINT_ENTRIES
+                    or not os.path.exists(os.path.join(model_dir, "index.json"))):
+                self._save_index(model_name)
+
+            if self.total_bytes > self.max_bytes:
+                self._evict()
+
+    def flush(self):
+        with self.lock:
+            for model_name in list(self.dirty_models):
+                self._save_index(model_name)
+
+    def size_bytes(self):
+        with self.lock:
+            return self._size_bytes()
+
+    def _size_bytes(self):
+        # Scanned once, then tracked in memory by put_many; compaction and pruning rescan
+        if self.total_bytes is None:
+            self.total_bytes = self._scan_size_bytes()
+        return self.total_bytes
+
+    def _scan_size_bytes(self):
+        total = 0
+        if not os.path.isdir(self.cache_dir):
+            return total
+        for model_dir in os.listdir(self.cache_dir):
+            vectors_path = os.path.join(self.cache_dir, model_dir, "vectors.f32")
+            if os.path.exists(vectors_path):
+                total += os.path.getsize(vectors_path)
+        return total
+
+    def _evict(self):
+        # Drop least recently used entries across all models until the cache is back to 90% of its budget
+        for model_dir in os.listdir(self.cache_dir):
+            index_path = os.path.join(self.cache_dir, model_dir, "index.json")
+            if os.path.exists(index_path):
+                with open(index_path, encoding='utf-8') as index_file:
+                    model_name = json.load(index_file)['model_name']
+                self._load_index(model_name)
+
+        candidates = sorted(
+            (entry[1], model_name, hash_value)
+            for model_name, index in self.indexes.items()
+            for hash_value, entry in index['entries'].items()
+        )
+        # Rows that are no longer referenced are reclaimed by the compaction below
+        excess = self._size_bytes() - int(self.max_bytes * 0.9)
+        for model_name, index in self.indexes.items():
+            excess -= (index['rows'] - len(index['entries'])) * (index['dimension'] or 0) * 4
+
+        touched = set()
+        for last_used, model_name, hash_value in candidates:
+            if excess <= 0:
+                break
+            index = self.indexes[model_name]
+            del index['entries'][hash_value]
+            excess -= index['dimension'] * 4
+            touched.add(model_name)
+
+        for model_name, index in self.indexes.items():
+            if model_name in touched or index['rows'] != len(index['entries']):
+                self._compact(model_name)
+        self.total_bytes = None
+
+    def _compact(self, model_name):
+        index = self.indexes[model_name]
+        vectors_path = os.path.join(self._model_dir(model_name), "vectors.f32")
+        if index['rows'] and os.path.exists(vectors_path):
+            matrix = np.fromfile(vectors_path, dtype=np.float32).reshape(index['rows'], index['dimension'])
+        else:
+            matrix = np.zeros((0, index['dimension'] or 0), dtype=np.float32)
+
+        hashes = list(index['entries'])
+        kept_rows = [index['entries'][hash_value][0] for hash_value in hashes]
+        with open(vectors_path + ".tmp", 'wb') as vectors_file:
+            vectors_file.write(matrix[kept_rows].tobytes())
+        os.replace(vectors_path + ".tmp", vectors_path)
+
+        for new_row, hash_value in enumerate(hashes):
+            index['entries'][hash_value][0] = new_row
+        index['rows'] = len(hashes)
+        self._save_index(model_name)
+
+    def prune_models(self, keep_models):
+        # Remove cached vectors of embedding models that are no longer in use
+        removed = []
+        keep_dirs = {model_directory_name(model_name) for model_name in keep_models}
+        with self.lock:
+            if not os.path.isdir(self.cache_dir):
+                return removed
+            for model_dir in os.listdir(self.cache_dir):
+                if model_dir not in keep_dirs:
+                    shutil.rmtree(os.path.join(self.cache_dir, model_dir))
+                    removed.append(model_dir)
+            self.indexes = {model_name: index for model_name, index in self.indexes.items()
+                            if model_directory_name(model_name) in keep_dirs}
+            self.dirty_models &= set(self.indexes)
+            self.total_bytes = None
+        return removed
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'size_bytes': self.size_bytes(),
+        }
+
+
+_shared_cache = None
+
+def embed_queries(embeddings, texts):
+    # Batches the queries only where the wrapper has a query-side batch method; documents and queries
+    # may be embedded differently (e.g. prefixed), so embed_documents is never a substitute
+    if hasattr(embeddings, 'embed_queries'):
+        return embeddings.embed_queries(texts)
+    return [embeddings.embed_query(text) for text in texts]
+
+
+def get_embedding_cache():
+    global _shared_cache
+    if _shared_cache is None:
+        _shared_cache = EmbeddingCache()
+    return _shared_cache
+
+
+class CachedEmbeddings(Embeddings):
+    # Consults the on-disk cache first and only sends missing texts to the wrapped embedding model
+
+    def __init__(self, embeddings, model_name, cache=None):
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.cache = cache if cache is not None else get_embedding_cache()
+
+    def embed_documents(self, texts):
+        hashes = [chunk_hash(text) for text in texts]
+        vectors = self.cache.get_many(self.model_name, hashes)
+        missing = {}
+        for position, vector in enumerate(vectors):
+            if vector is None:
+                missing.setdefault(hashes[position], position)
+        if missing:
+            new_vectors = self.embeddings.embed_documents([texts[position] for position in missing.values()])
+            self.cache.put_many(self.model_name, list(missing), new_vectors)
+            new_by_hash = dict(zip(missing, new_vectors))
+            vectors = [new_by_hash[hash_value] if vector is None else vector
+                       for hash_value, vector in zip(hashes, vectors)]
+        return [np.asarray(vector, dtype=np.float32).tolist() for vector in vectors]
+
+    def embed_queries(self, texts):
+        # Cache hits are read in one pass; misses are embedded as queries, never through embed_documents
+        hashes = [chunk_hash(text, kind="query") for text in texts]
+        vectors = self.cache.get_many(self.model_name, hashes)
+        missing = {}
+        for position, vector in enumerate(vectors):
+            if vector is None:
+                missing.setdefault(hashes[position], position)
+        if missing:
+            new_vectors = embed_queries(self.embeddings, [texts[position] for position in missing.values()])
+            self.cache.put_many(self.model_name, list(missing), new_vectors)
+            new_by_hash = dict(zip(missing, new_vectors))
+            vectors = [new_by_hash[hash_value] if vector is None else vector
+                       for hash_value, vector in zip(hashes, vectors)]
+        return [np.asarray(vector, dtype=np.float32).tolist() for vector in vectors]
+
+    def embed_query(self, text):
+        hash_value = chunk_hash(text, kind="query")
+        vector = self.cache.get_many(self.model_name, [hash_value])[0]
+        if vector is None:
+            vector = self.embeddings.embed_query(text)
+            self.cache.put_many(self.model_name, [hash_value], [vector])
+        return np.asarray(vector, dtype=np.float32).tolist()
+
+
+class QueryEmbeddingLRU(Embeddings):
+    # In-memory LRU of query string -> embedding in front of the embedding client; the templated retrieval
+    # queries repeat the same cause and effect names across many rows. Documents pass straight through.
+
+    def __init__(self, embeddings, max_size=DEFAULT_QUERY_CACHE_SIZE):
+        self.embeddings = embeddings
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def embed_documents(self, texts):
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text):
+        with self.lock:
+            vector = self.entries.get(text)
+            if vector is not None:
+                self.entries.move_to_end(text)
+                self.hits += 1
+                return list(vector)
+            self.misses += 1
+
+        vector = self.embeddings.embed_query(text)
+        with self.lock:
+            self.entries[text] = vector
+            self.entries.move_to_end(text)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+        return list(vector)
+
+    def embed_queries(self, texts):
+        # Hits are copied under the lock so a concurrent eviction cannot drop them before they are returned
+        with self.lock:
+            found = {}
+            for text in dict.fromkeys(texts):
+                if text in self.entries:
+                    self.entries.move_to_end(text)
+                    found[text] = self.entries[text]
+            missing = [text for text in dict.fromkeys(texts) if text not in found]
+            self.hits += len(texts) - len(missing)
+            self.misses += len(missing)
+
+        if missing:
+            new_vectors = embed_queries(self.embeddings, missing)
+            with self.lock:
+                for text, vector in zip(missing, new_vectors):
+                    self.entries[text] = vector
+                    found[text] = vector
+                while len(self.entries) > self.max_size:
+                    self.entries.popitem(last=False)
+        return [list(found[text]) for text in texts]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'size': len(self.entries),
+        }
@@ -0,0 +1,329 @@
+import os
+import time
+import numpy as np
+from neo4j import GraphDatabase
+from pydantic import ConfigDict
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.retrievers import BaseRetriever
+from embeddingBackend import get_embeddings
+from embeddingCache import embed_queries
+
+# Neo4j vector indexes only take float32 lists, so the graph keeps a PCA-reduced copy next to the full vector.
+# What shrinks is the vector index searched per query; the full vector stays on the node as the source for
+# re-scoring, so property storage grows by the compact copy. float16 and int8 (with a per-vector scale) are
+# used for local snapshots and the benchmark
+COMPACT_EMBEDDING_PROPERTY = "embedding_compact"
+# Chunk node properties that never go into Document.metadata (and from there into the prompts)
+NON_METADATA_PROPERTIES = ('text_chunk', 'embedding', COMPACT_EMBEDDING_PROPERTY, 'id', 'fingerprint', 'granularity')
+DEFAULT_PCA_DIR = os.environ.get("EMBEDDING_PCA_DIR", "cache/pca")
+QUANTIZATION_DTYPES = ('float32', 'float16', 'int8')
+
+
+def normalize_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+def fit_pca(matrix, dimensions):
+    # Eigen-decomposition of the covariance is cheaper than a full SVD for many rows of 1024 dimensions
+    matrix = np.asarray(matrix, dtype=np.float64)
+    if dimensions > matrix.shape[1]:
+        raise ValueError(f"Cannot reduce {matrix.shape[1]} dimensions to {dimensions}")
+    mean = matrix.mean(axis=0)
+    centered = matrix - mean
+    eigenvalues, eigenvectors = np.linalg.eigh(centered.T @ centered)
+    order = np.argsort(eigenvalues)[::-1][:dimensions]
+    explained = eigenvalues[order].sum() / max(eigenvalues.sum(), 1e-12)
+    return {
+        'mean': mean.astype(np.float32),
+        'components': eigenvectors[:, order].T.astype(np.float32),
+        'explained_variance': float(explained),
+    }
+
+def project_vectors(pca, matrix):
+    # Projected vectors are re-normalized so cosine scores stay comparable
+    projected = (np.asarray(matrix, dtype=np.float32) - pca['mean']) @ pca['components'].T
+    return normalize_rows(projected).astype(np.float32)
+
+def metadata_projection(variable):
+    # Cypher map projection of a chunk node's metadata, shared by every retrieval path
+    return f"{variable} {{.*, {', '.join(f'{name}: Null' for name in NON_METADATA_PROPERTIES)}}}"
+
+def compact_index_name(index_name):
+    return f"{index_name}_compact"
+
+def pca_path(index_name, pca_dir=DEFAULT_PCA_DIR):
+    return os.path.join(pca_dir, f"{index_name}.npz")
+
+def save_pca(pca, index_name, pca_dir=DEFAULT_PCA_DIR):
+    os.makedirs(pca_dir, exist_ok=True)
+    np.savez(pca_path(index_name, pca_dir), mean=pca['mean'], components=pca['components'],
+             explained_variance=pca['explained_variance'])
+
+def load_pca(index_name, pca_dir=DEFAULT_PCA_DIR):
+    with np.load(pca_path(index_name, pca_dir)) as data:
+        return {'mean': data['mean'], 'components': data['components'],
+                'explained_variance': float(data['explained_variance'])}
+
+def load_fitted_pca(index_name, pca_dir=DEFAULT_PCA_DIR):
+    # None until compress_vector_embeddings has fitted a PCA for the index
+    if not os.path.exists(pca_path(index_name, pca_dir)):
+        return None
+    return load_pca(index_name, pca_dir)
+
+def quantize_vectors(matrix, dtype):
+    # Returns (codes, scales); scales is None unless dtype is int8
+    matrix = np.asarray(matrix, dtype=np.float32)
+    if dtype == 'float32':
+        return matrix, None
+    if dtype == 'float16':
+        return matrix.astype(np.float16), None
+    if dtype == 'int8':
+        scales = np.abs(matrix).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        codes = np.clip(np.rint(matrix / scales[:, None]), -127, 127).astype(np.int8)
+        return codes, scales.astype(np.float32)
+    raise ValueError(f"Unknown quantization dtype '{dtype}', expected one of {QUANTIZATION_DTYPES}")
+
+def dequantize_vectors(codes, scales=None):
+    matrix = codes.astype(np.float32)
+    if scales is not None:
+        matrix *= scales[:, None]
+    return matrix
+
+def bytes_per_vector(dimensions, dtype):
+    scale_bytes = 4 if dtype == 'int8' else 0
+    return dimensions * np.dtype(dtype).itemsize + scale_bytes
+
+
+class ProjectedEmbeddings(Embeddings):
+    # Projects query and document vectors through the stored PCA so they match the compact index
+
+    def __init__(self, embeddings, pca):
+        self.embeddings = embeddings
+        self.pca = pca
+
+    def embed_documents(self, texts):
+        return project_vectors(self.pca, self.embeddings.embed_documents(texts)).tolist()
+
+    def embed_query(self, text):
+        return project_vectors(self.pca, [self.embeddings.embed_query(text)])[0].tolist()
+
+    def embed_queries(self, texts):
+        return project_vectors(self.pca, embed_queries(self.embeddings, texts)).tolist()
+
+
+def read_stored_embeddings(tx, label='VectorEmbedding', embedding_property='embedding'):
+
+    query = f"""
+    MATCH (ve:{label})
+    WHERE ve.{embedding_property} IS NOT NULL
+    RETURN elementId(ve) AS element_id, ve.{embedding_property} AS embedding
+    """
+
+    element_ids = []
+    vectors = []
+    for record in tx.run(query):
+        element_ids.append(record['element_id'])
+        vectors.append(record['embedding'])
+    return element_ids, np.asarray(vectors, dtype=np.float32)
+
+def write_compact_embedding_batch(tx, rows):
+
+    query = f"""
+    UNWIND $rows AS row
+    MATCH (ve)
+    WHERE elementId(ve) = row.element_id
+    CALL db.create.setNodeVectorProperty(ve, '{COMPACT_EMBEDDING_PROPERTY}', row.embedding)
+    """
+
+    tx.run(query, rows=rows)
+
+def create_compact_vector_index(tx, index_name, label, dimensions):
+
+    query = f"""
+    CREATE VECTOR INDEX {index_name} IF NOT EXISTS
+    FOR (ve:{label}) ON (ve.{COMPACT_EMBEDDING_PROPERTY})
+    OPTIONS {{indexConfig: {{`vector.dimensions`: $dimensions, `vector.similarity_function`: 'cosine'}}}}
+    """
+
+    tx.run(query, dimensions=dimensions)
+
+def compress_vector_embeddings(dimensions=256, index_name="failure_mode_context_index", label='VectorEmbedding', batch_size=500):
+    # Fits a PCA on the stored full vectors, writes the reduced copy and indexes it as <index_name>_compact
+    driver = GraphDatabase.driver(
+        uri=os.environ["NEO4J_URI"],
+        auth=(os.environ["NEO4J_USERNAME"], os.environ["NEO4J_PASSWORD"])
+    )
+    compact_name = compact_index_name(index_name)
+
+    with driver.session() as session:
+        element_ids, matrix = session.execute_read(read_stored_embeddings, label)
+        if len(element_ids) == 0:
+            print(f"No embeddings found on {label} nodes")
+            driver.close()
+            return None
+
+        pca = fit_pca(matrix, dimensions)
+        save_pca(pca, compact_name)
+        compact = project_vectors(pca, matrix)
+
+        for start in range(0, len(element_ids), batch_size):
+            session.execute_write(write_compact_embedding_batch, [
+                {'element_id': element_id, 'embedding': vector.tolist()}
+                for element_id, vector in zip(element_ids[start:start + batch_size], compact[start:start + batch_size])
+            ])
+        session.execute_write(create_compact_vector_index, compact_name, label, dimensions)
+
+    driver.close()
+    print(f"Compact index '{compact_name}': {matrix.shape[1]} -> {dimensions} dimensions, "
+          f"{pca['explained_variance']:.1%} variance kept, {len(element_ids)} vectors")
+    return compact_name
+
+def compact_vector_search(session, query_vector, pca, k, index_name="failure_mode_context_index_compact", oversample=4, rescore=True):
+    # Searches the compact index and optionally re-scores oversampled candidates with the full vectors
+    compact_query = project_vectors(pca, [query_vector])[0]
+    candidates = k * oversample if rescore else k
+
+    query = f"""
+    CALL db.index.vector.queryNodes($index_name, $candidates, $vector)
+    YIELD node, score
+    RETURN elementId(node) AS element_id, node.text_chunk AS text_chunk, score,
+           CASE WHEN $rescore THEN node.embedding ELSE null END AS embedding,
+           {metadata_projection('node')} AS metadata
+    """
+
+    records = session.run(query, index_name=index_name, candidates=candidates,
+                          vector=compact_query.tolist(), rescore=rescore).data()
+    if rescore and records:
+        full = normalize_rows(np.asarray([record['embedding'] for record in records], dtype=np.float32))
+        full_query = normalize_rows(np.asarray([query_vector], dtype=np.float32))[0]
+        for record, score in zip(records, full @ full_query):
+            record['score'] = float(score)
+        records.sort(key=lambda record: record['score'], reverse=True)
+
+    for record in records:
+        record.pop('embedding', None)
+    return records[:k]
+
+
+class CompactRetriever(BaseRetriever):
+    # Searches the compact index with the projected query and re-scores the oversampled candidates
+    # with the full vectors, so the compact index only narrows the candidates
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    driver: object
+    embeddings: object
+    pca: dict
+    index_name: str
+    database: str = "neo4j"
+    k: int = 10
+    oversample: int = 4
+    rescore: bool = True
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        with self.driver.session(database=self.database) as session:
+            records = compact_vector_search(session, self.embeddings.embed_query(query), self.pca, self.k,
+                                            self.index_name, self.oversample, self.rescore)
+        return [
+            Document(page_content=record['text_chunk'],
+                     metadata={key: value for key, value in record['metadata'].items() if value is not None})
+            for record in records
+        ]
+
+def get_benchmark_queries(tx, limit=50):
+    # The same templated queries the retrieve_*_from_vector functions send to failure_mode_context_index
+    query = """
+    CALL {
+        MATCH (se:SystemElement) RETURN 'Functions of ' + se.name AS query LIMIT $limit
+        UNION
+        MATCH (f:Function) RETURN 'Failure Modes of Function ' + f.name + ' with failure effects and failure causes' AS query LIMIT $limit
+        UNION
+        MATCH (fc:FailureCause) RETURN 'Detective Measures for Failure cause ' + fc.name AS query LIMIT $limit
+        UNION
+        MATCH (fc:FailureCause) RETURN 'Occurrence of failure cause ' + fc.name AS query LIMIT $limit
+        UNION
+        MATCH (fe:FailureEffect) RETURN 'Severity of failure effect ' + fe.name AS query LIMIT $limit
+    }
+    RETURN query
+    """
+    return [record['query'] for record in tx.run(query, limit=limit)]
+
+def top_k_indices(scores, k):
+    k = min(k, scores.shape[1])
+    candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(scores, candidates, axis=1), axis=1)
+    return np.take_along_axis(candidates, order, axis=1)
+
+def recall_at_k(expected, found):
+    return float(np.mean([len(set(e) & set(f)) / len(e) for e, f in zip(expected, found)]))
+
+def evaluate_compression(matrix, query_matrix, k=10, dimensions=(64, 128, 256, 512), dtypes=QUANTIZATION_DTYPES, oversample=4):
+    # Exact full-precision search is the reference; every variant is scored by recall@k against it
+    matrix = normalize_rows(np.asarray(matrix, dtype=np.float32))
+    query_matrix = normalize_rows(np.asarray(query_matrix, dtype=np.float32))
+    full_dimensions = matrix.shape[1]
+    expected = top_k_indices(query_matrix @ matrix.T, k)
+    full_bytes = bytes_per_vector(full_dimensions, 'float32') * len(matrix)
+
+    results = []
+    for reduced_dimensions in sorted(set(dimensions) | {full_dimensions}):
+        if reduced_dimensions > full_dimensions or reduced_dimensions > len(matrix):
+            continue
+        if reduced_dimensions == full_dimensions:
+            corpus, queries = matrix, query_matrix
+        else:
+            pca = fit_pca(matrix, reduced_dimensions)
+            corpus, queries = project_vectors(pca, matrix), project_vectors(pca, query_matrix)
+
+        for dtype in dtypes:
+            codes, scales = quantize_vectors(corpus, dtype)
+            scores = queries @ dequantize_vectors(codes, scales).T
+            found = top_k_indices(scores, k)
+
+            # Re-score oversampled candidates with the full vectors
+            candidates = top_k_indices(scores, k * oversample)
+            rescored = np.take_along_axis(query_matrix @ matrix.T, candidates, axis=1)
+            rescored_found = np.take_along_axis(candidates, np.argsort(-rescored, axis=1)[:, :k], axis=1)
+
+            total_bytes = bytes_per_vector(reduced_dimensions, dtype) * len(matrix)
+            results.append({
+                'dimensions': reduced_dimensions,
+                'dtype': dtype,
+                'bytes': total_bytes,
+                'memory_saved': 1 - total_bytes / full_bytes,
+                'recall': recall_at_k(expected, found),
+                'recall_rescored': recall_at_k(expected, rescored_found),
+            })
+    return results
+
+def benchmark_compression(k=10, dimensions=(64, 128, 256, 512), dtypes=QUANTIZATION_DTYPES, oversample=4, query_limit=50):
+    # Reports memory saved against recall@k for the stored failure_mode_context_index vectors
+    embeddings = get_embeddings()
+    driver = GraphDatabase.driver(
+        uri=os.environ["NEO4J_URI"],
+        auth=(os.environ["NEO4J_USERNAME"], os.environ["NEO4J_PASSWORD"])
+    )
+
+    with driver.session() as session:
+        _, matrix = session.execute_read(read_stored_embeddings)
+        queries = session.execute_read(get_benchmark_queries, query_limit)
+    driver.close()
+
+    if len(matrix) == 0 or not queries:
+        print("Nothing to benchmark: no stored embeddings or queries")
+        return []
+
+    start_time = time.perf_counter()
+    query_matrix = np.asarray([embeddings.embed_query(query) for query in queries], dtype=np.float32)
+    results = evaluate_compression(matrix, query_matrix, k, dimensions, dtypes, oversample)
+
+    print(f"{len(matrix)} vectors, {len(queries)} queries, recall@{k} "
+          f"(evaluated in {time.perf_counter() - start_time:.1f}s)")
+    print(f"{'dims':>6} {'dtype':>8} {'MiB':>9} {'saved':>7} {'recall':>7} {'rescored':>9}")
+    for result in results:
+        print(f"{result['dimensions']:>6} {result['dtype']:>8} {result['bytes'] / 2**20:>9.2f} "
+              f"{result['memory_saved']:>7.1%} {result['recall']:>7.3f} {result['recall_rescored']:>9.3f}")
+    return results
@@ -1,21 +1,93 @@
 from langchain_core.prompts import ChatPromptTemplate
+import os
+import re
+from dataImport import name_lower_key, RELATIONSHIP_SPECS, NAME_FULLTEXT_INDEXES
 
-def qa_system_generation_query(entities: dict) -> str:
+# How entity names from the table are resolved to nodes; every mode is served by an index
+# (RANGE index on name_lower for exact/prefix, TEXT index for contains, the label's <entity>_name_fulltext index for fuzzy)
+LOOKUP_MODES = ('contains', 'exact', 'prefix', 'fuzzy')
+DEFAULT_LOOKUP_MODE = os.environ.get("FMEA_GRAPH_LOOKUP_MODE", "contains")
+FUZZY_LOOKUP_LIMIT = 100
+NAME_OPERATORS = {'contains': 'CONTAINS', 'exact': '=', 'prefix': 'STARTS WITH', 'fuzzy': 'CONTAINS'}
+# Schema relationship types from dataImport; traversals name them so the planner only expands matching relationships
+SCHEMA_RELATIONSHIP_TYPES = "|".join(RELATIONSHIP_SPECS)
+MEASURE_RELATIONSHIP_TYPES = "isImprovedByPreventiveMeasure|isImprovedByDetectiveMeasure"
+
+def resolve_lookup_mode(mode):
+    mode = mode or DEFAULT_LOOKUP_MODE
+    if mode not in LOOKUP_MODES:
+        raise ValueError(f"Unknown lookup mode '{mode}', expected one of {LOOKUP_MODES}")
+    return mode
+
+def name_predicate(variable, value_expression, mode=None):
+    # Secondary name filters; fuzzy only applies to the anchor lookup and falls back to contains here
+    return f"{variable}.name_lower {NAME_OPERATORS[resolve_lookup_mode(mode)]} {value_expression}"
+
+def entity_lookup(variable, label, parameter, mode=None, batched=False):
+    # Cypher binding `variable` to the nodes of `label` whose name matches $parameter,
+    # or item.parameter when the query runs UNWIND $items AS item
+    mode = resolve_lookup_mode(mode)
+    value = f"item.{parameter}" if batched else f"${parameter}"
+    if mode == 'fuzzy':
+        carried = f"item, {variable}" if batched else variable
+        return f"""CALL db.index.fulltext.queryNodes('{NAME_FULLTEXT_INDEXES[label]}', {value}_fuzzy, {{limit: {FUZZY_LOOKUP_LIMIT}}})
+        YIELD node AS {variable}
+        WITH {carried}"""
+    return f"""MATCH ({variable}:{label})
+        WHERE {name_predicate(variable, value, mode)}"""
+
+def fuzzy_fulltext_query(name):
+    # Every word must match within the default edit distance; punctuation is dropped like the analyzer does
+    return " AND ".join(f"{term}~" for term in re.findall(r"\w+", name))
+
+def lookup_params(names, mode=None):
+    # Lowercased values for the name_lower predicates, plus fulltext queries in fuzzy mode
+    params = {}
+    for parameter, name in names.items():
+        params[parameter] = name_lower_key(name)
+        if resolve_lookup_mode(mode) == 'fuzzy':
+            params[f"{parameter}_fuzzy"] = fuzzy_fulltext_query(name)
+    return params
+
+def batch_lookup_items(names, parameter, mode=None):
+    # One UNWIND item per distinct input name; `key` is the name as given, so results can be keyed by input
+    return [{'key': name, **lookup_params({parameter: name}, mode)} for name in dict.fromkeys(names) if name]
+
+def batch_query_prefix(batched):
+    return "UNWIND $items AS item" if batched else ""
+
+def batch_key_column(batched):
+    return "item.key as item_key," if batched else ""
+
+def group_batch_results(raw_results, items, format_record):
+    # input name -> formatted records; names without matches map to an empty list like the single lookups
+    grouped = {item['key']: [] for item in items}
+    for result in raw_results:
+        grouped[result['item_key']].append(format_record(result))
+    return grouped
+
+# BroaderContext text chunks returned per entity name by the QA query
+BROADER_CONTEXT_LIMIT = 50
+
+# Entity types the QA query may use as labels; labels cannot be parameters, so they are validated instead
+QUERYABLE_ENTITY_LABELS = ('Product', 'Subsystem', 'SystemElement', 'Function', 'FailureMode', 'FailureCause', 'FailureEffect', 'Measure')
+
+def qa_system_generation_query(entities: dict, lookup_mode=None) -> tuple:
+    # Returns (query, params); the query text only depends on which entity types are present,
+    # so repeated questions reuse the cached plan
     only_product_has_entities = (
     entities.get('Product', []) and  
     all(not entity_list for entity_type, entity_list in entities.items() if entity_type != 'Product') 
 )
+    product_predicate = name_predicate('p', 'product_name', lookup_mode)
     if only_product_has_entities:
-        product_entities = entities['Product']
-        union_parts = []
-        
-        for product_entity in product_entities:
-            clean_product = product_entity.replace("'", "\\'")
-            
-            # Product to Subsystem relationships
-            product_subsystem_query = f"""
-            MATCH (p:Product)-[r1]-(s:Subsystem)
-            WHERE toLower(p.name) CONTAINS toLower('{clean_product}')
+        final_query = f"""
+        UNWIND $product_names AS product_name
+        CALL {{
+            WITH product_name
+            // Product to Subsystem relationships
+            MATCH (p:Product)-[r1:hasSubsystem]->(s:Subsystem)
+            WHERE {product_predicate}
             RETURN p.name as main_node_name,
                 ['Product'] as main_node_type,
                 {{}} as main_node_properties,
@@ -24,12 +96,11 @@ def qa_system_generation_query(entities: dict) -> str:
                 ['Subsystem'] as connected_node_type,
                 {{}} as connected_node_properties,
                 p.name as product_context
-            """
-            
-            # Subsystem to SystemElement relationships
-            subsystem_element_query = f"""
-            MATCH (p:Product)-[]-(s:Subsystem)-[r2]-(se:SystemElement)
-            WHERE toLower(p.name) CONTAINS toLower('{clean_product}')
+            UNION
+            WITH product_name
+            // Subsystem to SystemElement relationships
+            MATCH (p:Product)-[:hasSubsystem]->(s:Subsystem)-[r2:hasSystemElement]->(se:SystemElement)
+            WHERE {product_predicate}
             RETURN s.name as main_node_name,
                 ['Subsystem'] as main_node_type,
                 {{}} as main_node_properties,
@@ -38,74 +109,81 @@ def qa_system_generation_query(entities: dict) -> str:
                 ['SystemElement'] as connected_node_type,
                 {{}} as connected_node_properties,
                 p.name as product_context
-            """
-            
-            union_parts.append(product_subsystem_query.strip())
-            union_parts.append(subsystem_element_query.strip())
-        
-        final_query = "\nUNION\n".join(union_parts) + " ORDER BY product_context, main_node_type DESC"
+        }}
+        RETURN DISTINCT main_node_name, main_node_type, main_node_properties, relationship,
+               connected_node_name, connected_node_type, connected_node_properties, product_context
+        ORDER BY product_context, main_node_type DESC
+        """
         
-        return final_query
+        return final_query, {'product_names': [name_lower_key(name) for name in entities['Product']]}
     else:
         union_parts = []
+        params = {'entity_names': []}
         
-        for entity_type, entity_list in entities.items():
+        for entity_type in QUERYABLE_ENTITY_LABELS:
+            entity_list = entities.get(entity_type)
             if entity_list:
-                for entity in entity_list:
-                    clean_entity = entity.replace("'", "\\'")
-                    
-                    # entity search
-                    entity_query = f"""
-                    MATCH (n:{entity_type})
-                    WHERE toLower(n.name) CONTAINS toLower('{clean_entity}')
-                    OPTIONAL MATCH (n)-[r]-(connected)
-                    WHERE NOT 'VectorEmbedding' IN labels(connected)
-                    RETURN n.name as main_node_name,
-                        labels(n) as main_node_type,
-                        CASE 
-                            WHEN 'VectorEmbedding' IN labels(n) 
-                            THEN {{text_chunk: n.text_chunk}}
-                            ELSE apoc.map.removeKeys(properties(n), ['id', 'name', 'embedding', 'failure_mode_id'])
-                        END as main_node_properties,
-                        type(r) as relationship,
-                        properties(r) as relationship_properties,
-                        connected.name as connected_node_name,
-                        labels(connected) as connected_node_type,
-                        apoc.map.removeKeys(properties(connected), ['id', 'name', 'embedding', 'failure_mode_id']) as connected_node_properties
-                    """
-                    
-                    # VectorEmbedding text_chunk search
-                    vector_query = f"""
-                    MATCH (v:VectorEmbedding)
-                    WHERE toLower(v.text_chunk) CONTAINS toLower('{clean_entity}')
-                    RETURN null as main_node_name,
-                        ['BroaderContext'] as main_node_type,
-                        {{text_chunk: v.text_chunk}} as main_node_properties,
-                        null as relationship,
-                        null as relationship_properties,
-                        null as connected_node_name,
-                        null as connected_node_type,
-                        null as connected_node_properties
-                    """
-                    
-                    union_parts.append(entity_query.strip())
-                    union_parts.append(vector_query.strip())
+                params[f'{entity_type}_names'] = [name_lower_key(name) for name in entity_list]
+                params['entity_names'].extend(params[f'{entity_type}_names'])
+                
+                # entity search
+                entity_query = f"""
+                UNWIND ${entity_type}_names AS entity_name
+                MATCH (n:{entity_type})
+                WHERE {name_predicate('n', 'entity_name', lookup_mode)}
+                OPTIONAL MATCH (n)-[r:{SCHEMA_RELATIONSHIP_TYPES}]-(connected)
+                RETURN n.name as main_node_name,
+                    labels(n) as main_node_type,
+                    CASE 
+                        WHEN 'VectorEmbedding' IN labels(n) 
+                        THEN {{text_chunk: n.text_chunk}}
+                        ELSE apoc.map.removeKeys(properties(n), ['id', 'name', 'embedding', 'failure_mode_id', 'name_lower'])
+                    END as main_node_properties,
+                    type(r) as relationship,
+                    properties(r) as relationship_properties,
+                    connected.name as connected_node_name,
+                    labels(connected) as connected_node_type,
+                    apoc.map.removeKeys(properties(connected), ['id', 'name', 'embedding', 'failure_mode_id', 'name_lower']) as connected_node_properties
+                """
+                union_parts.append(entity_query.strip())
         
         if not union_parts:
-            return []
+            return None, {}
         
-        final_query = "\nUNION\n".join(union_parts) + " LIMIT 50"
+        # VectorEmbedding text_chunk search; only this branch is limited, entity and relationship rows are kept whole
+        vector_query = f"""
+        UNWIND $entity_names AS entity_name
+        CALL {{
+            WITH entity_name
+            MATCH (v:VectorEmbedding)
+            WHERE toLower(v.text_chunk) CONTAINS entity_name
+            RETURN v LIMIT {BROADER_CONTEXT_LIMIT}
+        }}
+        RETURN null as main_node_name,
+            ['BroaderContext'] as main_node_type,
+            {{text_chunk: v.text_chunk}} as main_node_properties,
+            null as relationship,
+            null as relationship_properties,
+            null as connected_node_name,
+            null as connected_node_type,
+            null as connected_node_properties
+        """
+        union_parts.append(vector_query.strip())
+        
+        final_query = "\nUNION\n".join(union_parts)
         
-        return final_query
+        return final_query, params
 
-def retrieve_qa_system_generation_data(question: str, entities: dict, llm, graph, debug: bool) -> dict:
+def retrieve_qa_system_generation_data(question: str, entities: dict, llm, graph, debug: bool, lookup_mode=None) -> dict:
     if debug:
         print("Entities for query: ", entities)
     
-    query = qa_system_generation_query(entities)
+    query, params = qa_system_generation_query(entities, lookup_mode)
+    if not query:
+        return []
         
     try:
-        results = graph.query(query)
+        results = graph.query(query, params)
         results = format_qa_system_generation_results(results)
         if debug:
             print(query)
@@ -168,36 +246,38 @@ def format_qa_system_generation_results(fallback_results: list) -> list:
     
     return formatted_results
 
-def retrieve_functions_from_graph(element_context: dict, graph, debug):
-    try:
-        # Extract values from element context
-        system_element = element_context.get('SystemElement')
-        clean_system_element = system_element.replace("'", "\\'")
-
-        cypher_query = f"""
-        MATCH (se:SystemElement)
-        WHERE toLower(se.name) CONTAINS toLower('{clean_system_element}')
-        OPTIONAL MATCH (se)-[]-(f:Function)
-        OPTIONAL MATCH (se)-[]-(ss:Subsystem)
-        OPTIONAL MATCH (ss)-[]-(p:Product)
-        RETURN se.name as system_element_name,
+def functions_query(lookup_mode=None, batched=False):
+    return f"""
+        {batch_query_prefix(batched)}
+        {entity_lookup('se', 'SystemElement', 'system_element', lookup_mode, batched)}
+        OPTIONAL MATCH (se)-[:hasFunction]->(f:Function)
+        OPTIONAL MATCH (ss:Subsystem)-[:hasSystemElement]->(se)
+        OPTIONAL MATCH (p:Product)-[:hasSubsystem]->(ss)
+        RETURN {batch_key_column(batched)}
+               se.name as system_element_name,
                f.name as function_name,
                ss.name as subsystem_name,
                p.name as product_name
         """
-        raw_results = graph.query(cypher_query)
-        
-        function_hierarchy = []
+
+def format_function_record(result):
+    return {
+        'Product': result.get('product_name'),
+        'Subsystem': result.get('subsystem_name'), 
+        'SystemElement': result.get('system_element_name'),
+        'Function': result.get('function_name')
+    }
+
+def retrieve_functions_from_graph(element_context: dict, graph, debug, lookup_mode=None):
+    try:
+        # Extract values from element context
+        system_element = element_context.get('SystemElement')
+
+        # The query text only varies with the lookup mode, so each mode keeps one cached plan
+        cypher_query = functions_query(lookup_mode)
+        raw_results = graph.query(cypher_query, lookup_params({'system_element': system_element}, lookup_mode))
         
-        for result in raw_results:
-            function_entry = {
-                'Product': result.get('product_name'),
-                'Subsystem': result.get('subsystem_name'), 
-                'SystemElement': result.get('system_element_name'),
-                'Function': result.get('function_name')
-            }
-            
-            function_hierarchy.append(function_entry)
+        function_hierarchy = [format_function_record(result) for result in raw_results]
             
         if debug:
             print(f"Functions hierarchy for {system_element}: ", function_hierarchy)
@@ -208,53 +288,94 @@ def retrieve_functions_from_graph(element_context: dict, graph, debug):
         if debug:
             print(f"Error retrieving functions from graph: {type(e).__name__}: {e}")
         return []
+
+def retrieve_functions_from_graph_batch(element_contexts: list, graph, debug, lookup_mode=None):
+    # Functions of every system element in one round trip, keyed by the SystemElement name of the context
+    try:
+        items = batch_lookup_items([context.get('SystemElement') for context in element_contexts], 'system_element', lookup_mode)
+        if not items:
+            return {}
+
+        raw_results = graph.query(functions_query(lookup_mode, batched=True), {'items': items})
+        function_hierarchies = group_batch_results(raw_results, items, format_function_record)
+
+        if debug:
+            for system_element, function_hierarchy in function_hierarchies.items():
+                print(f"Functions hierarchy for {system_element}: ", function_hierarchy)
+
+        return function_hierarchies
+
+    except Exception as e:
+        if debug:
+            print(f"Error retrieving functions from graph: {type(e).__name__}: {e}")
+        return {}
     
 
-def retrieve_failures_from_graph(element_context: dict, graph, debug):
+def failures_query(lookup_mode=None, batched=False):
+    # One record per function: failure modes with their causes and effects are collected per hop,
+    # instead of returning the cross product of causes x effects
+    return f"""
+        {batch_query_prefix(batched)}
+        {entity_lookup('f', 'Function', 'function', lookup_mode, batched)}
+        OPTIONAL MATCH (se:SystemElement)-[:hasFunction]->(f)
+        OPTIONAL MATCH (s:Subsystem)-[:hasSystemElement]->(se)
+        OPTIONAL MATCH (p:Product)-[:hasSubsystem]->(s)
+        CALL {{
+            WITH f
+            OPTIONAL MATCH (f)-[:hasFailureMode]->(fm:FailureMode)
+            CALL {{
+                WITH fm
+                OPTIONAL MATCH (fm)-[:isDueToFailureCause]->(fc:FailureCause)
+                RETURN collect(DISTINCT fc.name) AS failure_causes
+            }}
+            CALL {{
+                WITH fm
+                OPTIONAL MATCH (fm)-[:resultsInFailureEffect]->(fe:FailureEffect)
+                RETURN collect(DISTINCT fe.name) AS failure_effects
+            }}
+            RETURN collect(DISTINCT CASE WHEN fm IS NOT NULL THEN
+                {{failure_mode_name: fm.name, failure_causes: failure_causes, failure_effects: failure_effects}}
+            END) AS failure_modes
+        }}
+        RETURN {batch_key_column(batched)}
+               se.name as system_element_name,
+               f.name as function_name,
+               failure_modes,
+               s.name as subsystem_name,
+               p.name as product_name
+        """
+
+def format_failure_record(result):
+    return {
+        'Product': result.get('product_name'),
+        'Subsystem': result.get('subsystem_name'),
+        'SystemElement': result.get('system_element_name'),
+        'Function': result.get('function_name'),
+        'FailureModes': [
+            {
+                'FailureMode': failure_mode['failure_mode_name'],
+                'FailureEffect': failure_mode['failure_effects'],
+                'FailureCause': failure_mode['failure_causes']
+            }
+            for failure_mode in result.get('failure_modes') or []
+        ]
+    }
+
+def retrieve_failures_from_graph(element_context: dict, graph, debug, lookup_mode=None):
     try:
         # Extract values from element context
         #system_element = element_context.get('SystemElement')
         #clean_system_element = system_element.replace("'", "\\'")
         function = element_context.get('Function')
-        clean_function = function.replace("'", "\\'")
-        
-        cypher_query = f"""
-        MATCH (f:Function)
-        WHERE toLower(trim(f.name)) CONTAINS toLower(trim('{clean_function}'))
-        OPTIONAL MATCH (f)-[]-(se:SystemElement)
-        OPTIONAL MATCH (f)-[]-(fm:FailureMode)
-        OPTIONAL MATCH (fm)-[]-(fc:FailureCause)
-        OPTIONAL MATCH (fm)-[]-(fe:FailureEffect)
-        OPTIONAL MATCH (se)-[]-(s:Subsystem)
-        OPTIONAL MATCH (s)-[]-(p:Product)
-        RETURN se.name as system_element_name,
-               f.name as function_name,
-               fm.name as failure_mode_name,
-               fc.name as failure_cause_name,
-               fe.name as failure_effect_name,
-               s.name as subsystem_name,
-               p.name as product_name
-        """
         
-        raw_results = graph.query(cypher_query)
+        cypher_query = failures_query(lookup_mode)
         
-        failure_list = []
+        raw_results = graph.query(cypher_query, lookup_params({'function': function}, lookup_mode))
         
-        for result in raw_results:
-            failure_entry = {
-                'Product': result.get('product_name'),
-                'Subsystem': result.get('subsystem_name'),
-                'SystemElement': result.get('system_element_name'),
-                'Function': result.get('function_name'),
-                'FailureMode': result.get('failure_mode_name'),
-                'FailureEffect': result.get('failure_effect_name'),
-                'FailureCause': result.get('failure_cause_name')
-            }
-            
-            failure_list.append(failure_entry)
+        failure_list = [format_failure_record(result) for result in raw_results]
             
         if debug:
-            print(f"Total Failure entries for {clean_function}: ", failure_list)
+            print(f"Total Failure entries for {function}: ", failure_list)
 
         return failure_list
      
@@ -264,69 +385,97 @@ def retrieve_failures_from_graph(element_context: dict, graph, debug):
         return []
     
 
-def retrieve_existing_measures_from_graph(element_context: dict, graph, debug):
-
+def retrieve_failures_from_graph_batch(function_contexts: list, graph, debug, lookup_mode=None):
+    # Failure modes of every function in one round trip, keyed by the Function name of the context
     try:
-        # Extract values from element context
-        failure_cause = element_context.get('FailureCause')
-        failure_mode = element_context.get('FailureMode')
+        items = batch_lookup_items([context.get('Function') for context in function_contexts], 'function', lookup_mode)
+        if not items:
+            return {}
 
-        clean_failure_cause = failure_cause.replace("'", "\\'")
-        clean_failure_mode = failure_mode.replace("'", "\\'")
+        raw_results = graph.query(failures_query(lookup_mode, batched=True), {'items': items})
+        failure_lists = group_batch_results(raw_results, items, format_failure_record)
 
-        cypher_query = f"""
-        MATCH (fc:FailureCause)-[r:isDueToFailureCause]-(fm:FailureMode)
-        WHERE toLower(fc.name) CONTAINS toLower('{clean_failure_cause}')
-          AND toLower(fm.name) CONTAINS toLower('{clean_failure_mode}')
-        OPTIONAL MATCH (fc)-[]-(m:Measure)
-        WHERE (m.type <> 'detective' OR (m)-[:improvesDetectionFor]->(fm))
-        OPTIONAL MATCH (fm)-[]-(fe:FailureEffect)
-        OPTIONAL MATCH (fm)-[]-(f:Function)
-        OPTIONAL MATCH (f)-[]-(se:SystemElement)
-        OPTIONAL MATCH (se)-[]-(s:Subsystem)
-        OPTIONAL MATCH (s)-[]-(p:Product)
+        if debug:
+            for function, failure_list in failure_lists.items():
+                print(f"Total Failure entries for {function}: ", failure_list)
+
+        return failure_lists
+
+    except Exception as e:
+        if debug:
+            print(f"Error retrieving failures from graph: {type(e).__name__}: {e}")
+        return {}
+    
+
+def existing_measures_query(lookup_mode=None):
+    # One record per failure cause / failure mode pair with its measures and effects collected per hop
+    return f"""
+        {entity_lookup('fc', 'FailureCause', 'failure_cause', lookup_mode)}
+        MATCH (fm:FailureMode)-[r:isDueToFailureCause]->(fc)
+        WHERE {name_predicate('fm', '$failure_mode', lookup_mode)}
+        OPTIONAL MATCH (f:Function)-[:hasFailureMode]->(fm)
+        OPTIONAL MATCH (se:SystemElement)-[:hasFunction]->(f)
+        OPTIONAL MATCH (s:Subsystem)-[:hasSystemElement]->(se)
+        OPTIONAL MATCH (p:Product)-[:hasSubsystem]->(s)
+        CALL {{
+            WITH fc, fm
+            OPTIONAL MATCH (fc)-[:{MEASURE_RELATIONSHIP_TYPES}]->(m:Measure)
+            WHERE (m.type <> 'detective' OR (m)-[:improvesDetectionFor]->(fm))
+            RETURN collect(DISTINCT CASE WHEN m IS NOT NULL THEN {{name: m.name, type: m.type}} END) AS measures
+        }}
+        CALL {{
+            WITH fm
+            OPTIONAL MATCH (fm)-[:resultsInFailureEffect]->(fe:FailureEffect)
+            RETURN collect(DISTINCT fe.name) AS failure_effects
+        }}
         RETURN fc.name as failure_cause_name,
-               m.name as measure_name,
-               m.type as measure_type,
+               measures,
                fm.name as failure_mode_name,
-               fe.name as failure_effect_name,
+               failure_effects,
                f.name as function_name,
                se.name as system_element_name,
                s.name as subsystem_name,
                p.name as product_name
         """
 
-        raw_results = graph.query(cypher_query)
+def format_measure_record(result, debug=False):
+    measure_entry = {
+        'Product': result.get('product_name'),
+        'Subsystem': result.get('subsystem_name'),
+        'SystemElement': result.get('system_element_name'),
+        'Function': result.get('function_name'),
+        'FailureMode': result.get('failure_mode_name'),
+        'FailureCause': result.get('failure_cause_name'),
+        'FailureEffect': result.get('failure_effects') or [],
+        'PreventiveMeasure': [],
+        'DetectiveMeasure': []
+    }
+    
+    for measure in result.get('measures') or []:
+        measure_name = measure['name']
+        measure_type = (measure['type'] or '').lower()
+        if measure_type == 'preventive':
+            measure_entry['PreventiveMeasure'].append(measure_name)
+        elif measure_type == 'detective':
+            measure_entry['DetectiveMeasure'].append(measure_name)
+        else:
+            measure_entry['PreventiveMeasure'].append(measure_name)
+            if debug:
+                print(f"Unknown measure type '{measure_type}' for measure '{measure_name}', defaulting to preventive")
+    return measure_entry
 
-        measure_list = []
-        
-        for result in raw_results:
-            measure_type = result.get('measure_type', '').lower()
-            
-            # Create base entry structure
-            measure_entry = {
-                'Product': result.get('product_name'),
-                'Subsystem': result.get('subsystem_name'),
-                'SystemElement': result.get('system_element_name'),
-                'Function': result.get('function_name'),
-                'FailureMode': result.get('failure_mode_name'),
-                'FailureCause': result.get('failure_cause_name'),
-                'FailureEffect': result.get('failure_effect_name'),
-                'PreventiveMeasure': None,
-                'DetectiveMeasure': None
-            }
-            
-            measure_name = result.get('measure_name')
-            if measure_type == 'preventive':
-                measure_entry['PreventiveMeasure'] = measure_name
-            elif measure_type == 'detective':
-                measure_entry['DetectiveMeasure'] = measure_name
-            else:
-                measure_entry['PreventiveMeasure'] = measure_name
-                if debug:
-                    print(f"Unknown measure type '{measure_type}' for measure '{measure_name}', defaulting to preventive")
-            
-            measure_list.append(measure_entry)
+def retrieve_existing_measures_from_graph(element_context: dict, graph, debug, lookup_mode=None):
+
+    try:
+        # Extract values from element context
+        failure_cause = element_context.get('FailureCause')
+        failure_mode = element_context.get('FailureMode')
+
+        cypher_query = existing_measures_query(lookup_mode)
+
+        raw_results = graph.query(cypher_query, lookup_params({'failure_cause': failure_cause, 'failure_mode': failure_mode}, lookup_mode))
+
+        measure_list = [format_measure_record(result, debug) for result in raw_results]
         if debug:
             print(f"Total Failure entries for {failure_cause}: ", measure_list)
 
@@ -338,29 +487,18 @@ def retrieve_existing_measures_from_graph(element_context: dict, graph, debug):
         return []
     
 
-def retrieve_risk_ratings_from_graph(element_context: dict, graph, debug):
-
-    try:
-        # Extract values from element context
-        failure_cause = element_context.get('FailureCause')
-        failure_mode = element_context.get('FailureMode')
-        failure_effect = element_context.get('FailureEffect')
-
-        clean_failure_cause = failure_cause.replace("'", "\\'")
-        clean_failure_effect = failure_effect.replace("'", "\\'")
-        clean_failure_mode = failure_mode.replace("'", "\\'")
-
-        cypher_query = f"""
-        MATCH (fc:FailureCause)-[r:isDueToFailureCause]-(fm:FailureMode)-[]->(fe:FailureEffect)
-        WHERE toLower(fc.name) CONTAINS toLower('{clean_failure_cause}')
-          AND toLower(fm.name) CONTAINS toLower('{clean_failure_mode}')
-          AND toLower(fe.name) CONTAINS toLower('{clean_failure_effect}')
-        OPTIONAL MATCH (fc)-[]-(m:Measure)
+def risk_ratings_query(lookup_mode=None):
+    return f"""
+        {entity_lookup('fc', 'FailureCause', 'failure_cause', lookup_mode)}
+        MATCH (fe:FailureEffect)<-[:resultsInFailureEffect]-(fm:FailureMode)-[r:isDueToFailureCause]->(fc)
+        WHERE {name_predicate('fm', '$failure_mode', lookup_mode)}
+          AND {name_predicate('fe', '$failure_effect', lookup_mode)}
+        OPTIONAL MATCH (fc)-[:{MEASURE_RELATIONSHIP_TYPES}]->(m:Measure)
         WHERE (m.type <> 'detective' OR (m)-[:improvesDetectionFor]->(fm))
-        OPTIONAL MATCH (fm)-[]-(f:Function)
-        OPTIONAL MATCH (f)-[]-(se:SystemElement)
-        OPTIONAL MATCH (se)-[]-(s:Subsystem)
-        OPTIONAL MATCH (s)-[]-(p:Product)
+        OPTIONAL MATCH (f:Function)-[:hasFailureMode]->(fm)
+        OPTIONAL MATCH (se:SystemElement)-[:hasFunction]->(f)
+        OPTIONAL MATCH (s:Subsystem)-[:hasSystemElement]->(se)
+        OPTIONAL MATCH (p:Product)-[:hasSubsystem]->(s)
         RETURN fc.name as failure_cause_name,
                 r.detection_rating as failure_cause_detection,
                 fc.occurrence_rating as failure_cause_occurrence,
@@ -374,8 +512,19 @@ def retrieve_risk_ratings_from_graph(element_context: dict, graph, debug):
                s.name as subsystem_name,
                p.name as product_name
         """
+
+def retrieve_risk_ratings_from_graph(element_context: dict, graph, debug, lookup_mode=None):
+
+    try:
+        # Extract values from element context
+        failure_cause = element_context.get('FailureCause')
+        failure_mode = element_context.get('FailureMode')
+        failure_effect = element_context.get('FailureEffect')
+
+        cypher_query = risk_ratings_query(lookup_mode)
         
-        raw_results = graph.query(cypher_query)
+        raw_results = graph.query(cypher_query, lookup_params({'failure_cause': failure_cause, 'failure_mode': failure_mode,
+                                                               'failure_effect': failure_effect}, lookup_mode))
         
         grouped_results = {}
         
@@ -0,0 +1,88 @@
+import re
+from pydantic import ConfigDict
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from embeddingCompression import metadata_projection
+
+LUCENE_SPECIAL_CHARACTERS = re.compile(r'([+\-!(){}\[\]^"~*?:\\/&|])')
+
+
+def escape_lucene_query(text):
+    # Names like "Seal (O-Ring)" must be matched literally, not parsed as Lucene syntax
+    return LUCENE_SPECIAL_CHARACTERS.sub(r'\\\1', text)
+
+def reciprocal_rank_fusion(ranked_lists, weights, rrf_k=60):
+    # ranked_lists: {source: [hit, ...]} best first; a hit is a dict with element_id, text, metadata and score
+    fused = {}
+    for source, hits in ranked_lists.items():
+        for rank, hit in enumerate(hits, start=1):
+            entry = fused.setdefault(hit['element_id'], {'hit': hit, 'score': 0.0, 'sources': {}})
+            entry['score'] += weights.get(source, 1.0) / (rrf_k + rank)
+            entry['sources'][source] = hit['score']
+    return sorted(fused.values(), key=lambda entry: entry['score'], reverse=True)
+
+
+class HybridRetriever(BaseRetriever):
+    # Runs the vector and fulltext index searches in one round trip and fuses them with reciprocal-rank fusion
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    driver: object
+    embeddings: object
+    vector_index_name: str
+    fulltext_index_name: str
+    database: str = "neo4j"
+    k: int = 10
+    candidates: int = 20
+    vector_weight: float = 1.0
+    fulltext_weight: float = 1.0
+    vector_threshold: float = 0.0
+    fulltext_threshold: float = 0.0
+    rrf_k: int = 60
+
+    def search(self, query):
+
+        cypher = f"""
+        CALL {{
+            CALL db.index.vector.queryNodes($vector_index_name, $candidates, $vector)
+            YIELD node, score
+            WHERE score >= $vector_threshold
+            RETURN collect({{element_id: elementId(node), text: node.text_chunk, score: score,
+                            metadata: {metadata_projection('node')}}}) AS vector_hits
+        }}
+        CALL {{
+            CALL db.index.fulltext.queryNodes($fulltext_index_name, $fulltext_query, {{limit: $candidates}})
+            YIELD node, score
+            WHERE score >= $fulltext_threshold
+            RETURN collect({{element_id: elementId(node), text: node.text_chunk, score: score,
+                            metadata: {metadata_projection('node')}}}) AS fulltext_hits
+        }}
+        RETURN vector_hits, fulltext_hits
+        """
+
+        records, _, _ = self.driver.execute_query(
+            cypher,
+            vector_index_name=self.vector_index_name,
+            fulltext_index_name=self.fulltext_index_name,
+            candidates=max(self.candidates, self.k),
+            vector=self.embeddings.embed_query(query),
+            fulltext_query=escape_lucene_query(query.strip()),
+            vector_threshold=self.vector_threshold,
+            fulltext_threshold=self.fulltext_threshold,
+            database_=self.database,
+            routing_='r',
+        )
+        record = records[0]
+        fused = reciprocal_rank_fusion(
+            {'vector': record['vector_hits'], 'fulltext': record['fulltext_hits']},
+            {'vector': self.vector_weight, 'fulltext': self.fulltext_weight},
+            self.rrf_k
+        )
+        return fused[:self.k]
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        return [
+            Document(page_content=entry['hit']['text'],
+                     metadata={**entry['hit']['metadata'], 'rrf_score': entry['score'], 'source_scores': entry['sources']})
+            for entry in self.search(query)
+        ]
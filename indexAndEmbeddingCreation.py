@@ -1,11 +1,50 @@
 
 from neo4j import GraphDatabase
 import os
-from langchain_community.embeddings import OllamaEmbeddings
+import re
+import json
+import math
+import time
+import hashlib
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
 from langchain_community.vectorstores import Neo4jVector
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from embeddingBackend import get_embeddings
+from embeddingCompression import COMPACT_EMBEDDING_PROPERTY, compact_index_name, load_fitted_pca, project_vectors
+from dataImport import SCHEMA_INDEXES
 
+# Smaller chunks next to the one-per-failure-mode VectorEmbedding, each with its own label and vector index
+GRANULAR_CHUNK_LABELS = {
+    'cause': 'FailureCauseChunk',
+    'effect': 'FailureEffectChunk',
+    'measure': 'MeasureChunk',
+}
+VECTOR_INDEX_NAMES = {
+    'failure_mode': 'failure_mode_context_index',
+    'cause': 'failure_cause_chunk_index',
+    'effect': 'failure_effect_chunk_index',
+    'measure': 'measure_chunk_index',
+}
+# How granular chunks are measured against max_tokens: 'estimate' works offline, 'tiktoken' downloads cl100k_base
+CHUNK_TOKENIZERS = ('estimate', 'tiktoken')
+CHUNK_TOKENIZER = os.environ.get("FMEA_CHUNK_TOKENIZER", "estimate")
+TOKEN_ESTIMATE_PATTERN = re.compile(r"\w+|[^\w\s]")
+TOKENS_PER_WORD = 1.5
 
-def create_failure_mode_embeddings():
+# node label -> vector index over its embeddings
+LABEL_VECTOR_INDEX_NAMES = {
+    GRANULAR_CHUNK_LABELS.get(granularity, 'VectorEmbedding'): index_name
+    for granularity, index_name in VECTOR_INDEX_NAMES.items()
+}
+FULLTEXT_INDEX_NAMES = {
+    'failure_mode': 'fulltext_vector_text_chunk',
+    'cause': 'fulltext_failure_cause_chunk_text',
+    'effect': 'fulltext_failure_effect_chunk_text',
+    'measure': 'fulltext_measure_chunk_text',
+}
+
+
+def create_failure_mode_embeddings(batch_size=500):
     
     driver = GraphDatabase.driver(
         uri=os.environ["NEO4J_URI"],
@@ -18,25 +57,114 @@ def create_failure_mode_embeddings():
         
         print(f"Found {len(failure_modes)} failure modes to process")
         
-        # Generate text chunks for each failure mode
-        for failure_mode in failure_modes:
-            text_chunk = generate_failure_mode_text_chunk(failure_mode)
-            
-            session.execute_write(create_vector_embedding_node, 
-                                failure_mode['failure_mode_id'], 
-                                text_chunk)
-            
-            print(f"Created embedding for: {failure_mode['failure_mode_name']}")
+        # Generate text chunks for each failure mode and write them in batches
+        rows = build_vector_embedding_rows(failure_modes)
+        for start in range(0, len(rows), batch_size):
+            session.execute_write(create_vector_embedding_node_batch, rows[start:start + batch_size])
+            print(f"Created text chunks for {min(start + batch_size, len(rows))}/{len(rows)} failure modes")
     
     driver.close()
     print("Embedding generation completed!")
 
-def get_failure_modes_with_context(tx):
-    
+def build_vector_embedding_rows(failure_modes):
+    fingerprints = {
+        failure_mode_id: failure_mode_fingerprint(contexts)
+        for failure_mode_id, contexts in group_by_failure_mode(failure_modes).items()
+    }
+    return [
+        {'failure_mode_id': failure_mode['failure_mode_id'],
+         'text_chunk': generate_failure_mode_text_chunk(failure_mode),
+         'fingerprint': fingerprints[failure_mode['failure_mode_id']]}
+        for failure_mode in failure_modes
+    ]
+
+def get_failure_mode_id_page(tx, after_id, page_size):
+    # Keyset pagination over the id uniqueness constraint
     query = """
+    MATCH (fm:FailureMode)
+    WHERE fm.id > $after_id
+    RETURN fm.id AS failure_mode_id
+    ORDER BY fm.id
+    LIMIT $page_size
+    """
+    return [record['failure_mode_id'] for record in tx.run(query, after_id=after_id, page_size=page_size)]
+
+def iter_failure_mode_context_pages(session, page_size=200):
+    # Yields the context of at most page_size failure modes at a time
+    after_id = -1
+    while True:
+        failure_mode_ids = session.execute_read(get_failure_mode_id_page, after_id, page_size)
+        if not failure_mode_ids:
+            break
+        yield session.execute_read(get_failure_modes_with_context, failure_mode_ids)
+        after_id = failure_mode_ids[-1]
+
+def create_failure_mode_embeddings_streamed(page_size=200, embed_batch_size=64, max_workers=4):
+    # Extraction, chunking, embedding and write-back run as a pipeline over pages of failure modes,
+    # so peak memory is bounded by the page size and the first vectors are written right away
+    embeddings = get_embeddings()
+    driver = GraphDatabase.driver(
+        uri=os.environ["NEO4J_URI"],
+        auth=(os.environ["NEO4J_USERNAME"], os.environ["NEO4J_PASSWORD"])
+    )
+    
+    in_flight = {}
+    processed = 0
+    start_time = time.perf_counter()
+    
+    with driver.session() as session, \
+            ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="embedding") as executor:
+        
+        pca = get_compact_pca('VectorEmbedding')
+        
+        def write_completed(futures):
+            nonlocal processed
+            for future in futures:
+                batch = in_flight.pop(future)
+                session.execute_write(write_embedding_batch, build_embedding_write_rows(batch, future.result(), pca))
+                processed += len(batch)
+            if futures:
+                elapsed = time.perf_counter() - start_time
+                print(f"Embedded {processed} chunks ({processed / elapsed:.1f} chunks/s)")
+        
+        for failure_modes in iter_failure_mode_context_pages(session, page_size):
+            rows = build_vector_embedding_rows(failure_modes)
+            pending = session.execute_write(create_vector_embedding_node_batch, rows)
+            for start in range(0, len(pending), embed_batch_size):
+                batch = pending[start:start + embed_batch_size]
+                in_flight[executor.submit(embeddings.embed_documents, [row['text_chunk'] for row in batch])] = batch
+            
+            write_completed([future for future in in_flight if future.done()])
+            # Backpressure: do not read further pages while too many batches wait for the model
+            while len(in_flight) > max_workers * 2:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                write_completed(done)
+        
+        write_completed(wait(in_flight).done)
+    
+    driver.close()
+    elapsed = time.perf_counter() - start_time
+    print(f"Streamed embedding finished: {processed} chunks in {elapsed:.1f}s")
+    return processed
+
+def failure_mode_hierarchy_match(failure_mode_ids):
+    if failure_mode_ids is None:
+        return """
     MATCH (p:Product)-[:hasSubsystem]->(s:Subsystem)-[:hasSystemElement]->(se:SystemElement)
           -[:hasFunction]->(f:Function)-[:hasFailureMode]->(fm:FailureMode)
+    """
+    # Pages and delta runs seek their failure modes by id and walk up to the product from there,
+    # instead of filtering a walk over the whole hierarchy
+    return """
+    UNWIND $failure_mode_ids AS failure_mode_id
+    MATCH (fm:FailureMode {id: failure_mode_id})
+    MATCH (p:Product)-[:hasSubsystem]->(s:Subsystem)-[:hasSystemElement]->(se:SystemElement)
+          -[:hasFunction]->(f:Function)-[:hasFailureMode]->(fm)
+    """
+
+def get_failure_modes_with_context(tx, failure_mode_ids=None):
     
+    query = failure_mode_hierarchy_match(failure_mode_ids) + """
     OPTIONAL MATCH (fm)-[r:isDueToFailureCause]->(fc:FailureCause)
     OPTIONAL MATCH (fc)-[:isImprovedByPreventiveMeasure]->(pm:Measure {type: 'preventive'})
     OPTIONAL MATCH (fc)-[:isImprovedByDetectiveMeasure]->(dm:Measure {type: 'detective'})
@@ -70,7 +198,9 @@ def get_failure_modes_with_context(tx):
            effects_data
     """
     
-    result = tx.run(query)
+    if failure_mode_ids is not None:
+        failure_mode_ids = list(dict.fromkeys(failure_mode_ids))
+    result = tx.run(query, failure_mode_ids=failure_mode_ids)
     
     transformed_results = []
     for record in result:
@@ -186,13 +316,380 @@ def create_vector_embedding_node(tx, failure_mode_id, text_chunk):
     
     tx.run(query, failure_mode_id=failure_mode_id, text_chunk=text_chunk)
 
-def create_vector_index():
+def create_vector_embedding_node_batch(tx, rows):
+    
+    query = """
+    UNWIND $rows AS row
+    MATCH (fm:FailureMode {id: row.failure_mode_id})
+    MERGE (ve:VectorEmbedding {
+        failure_mode_id: row.failure_mode_id,
+        text_chunk: row.text_chunk
+    })
+    SET ve.fingerprint = row.fingerprint
+    MERGE (fm)-[:HAS_EMBEDDING]->(ve)
+    WITH ve
+    WHERE ve.embedding IS NULL
+    RETURN elementId(ve) AS element_id, ve.text_chunk AS text_chunk
+    """
+    
+    return [record.data() for record in tx.run(query, rows=rows)]
+
+def group_by_failure_mode(failure_modes):
+    # A failure mode reached through several functions has one context record per function
+    grouped = {}
+    for failure_mode in failure_modes:
+        grouped.setdefault(failure_mode['failure_mode_id'], []).append(failure_mode)
+    return grouped
+
+def failure_mode_fingerprint(contexts):
+    # Hash of the normalized neighbourhood (hierarchy, causes, effects, measures, ratings);
+    # collect() order is not stable, so every list is sorted first
+    normalized = []
+    for context in contexts:
+        causes = sorted(
+            ({**cause,
+              'preventive_measures': sorted(cause['preventive_measures']),
+              'detective_measures': sorted(cause['detective_measures'])}
+             for cause in context['causes']),
+            key=lambda cause: json.dumps(cause, sort_keys=True, default=str)
+        )
+        effects = sorted(context['effects'], key=lambda effect: json.dumps(effect, sort_keys=True, default=str))
+        normalized.append({**context, 'causes': causes, 'effects': effects})
+    normalized.sort(key=lambda context: json.dumps(context, sort_keys=True, default=str))
+    return hashlib.sha256(json.dumps(normalized, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+def get_embedding_fingerprints(tx):
+    
+    query = """
+    MATCH (fm:FailureMode)-[:HAS_EMBEDDING]->(ve:VectorEmbedding)
+    RETURN fm.id AS failure_mode_id, collect(DISTINCT ve.fingerprint) AS fingerprints
+    """
+    
+    return {record['failure_mode_id']: record['fingerprints'] for record in tx.run(query)}
+
+def replace_vector_embedding_nodes(tx, rows):
+    # Old and new chunks of a failure mode are swapped in the same transaction
+    query = """
+    UNWIND $failure_mode_ids AS failure_mode_id
+    MATCH (old:VectorEmbedding {failure_mode_id: failure_mode_id})
+    DETACH DELETE old
+    """
+    tx.run(query, failure_mode_ids=list({row['failure_mode_id'] for row in rows}))
+    
+    query = """
+    UNWIND $rows AS row
+    MATCH (fm:FailureMode {id: row.failure_mode_id})
+    CREATE (ve:VectorEmbedding {
+        failure_mode_id: row.failure_mode_id,
+        text_chunk: row.text_chunk,
+        fingerprint: row.fingerprint
+    })
+    CREATE (fm)-[:HAS_EMBEDDING]->(ve)
+    """
+    tx.run(query, rows=rows)
+
+def delete_orphaned_vector_embeddings(tx, label='VectorEmbedding'):
+    
+    query = f"""
+    MATCH (ve:{label})
+    WHERE NOT (ve)<-[:HAS_EMBEDDING]-(:FailureMode)
+    DETACH DELETE ve
+    RETURN count(*) AS deleted
+    """
+    
+    return tx.run(query).single()['deleted']
+
+def update_failure_mode_embeddings(failure_mode_ids=None, batch_size=500, embed_batch_size=64, max_workers=4):
+    # Incremental indexing: only failure modes whose neighbourhood fingerprint changed are re-chunked and re-embedded.
+    # failure_mode_ids (e.g. the changed ids reported by the delta import) narrows the scan further.
+    driver = GraphDatabase.driver(
+        uri=os.environ["NEO4J_URI"],
+        auth=(os.environ["NEO4J_USERNAME"], os.environ["NEO4J_PASSWORD"])
+    )
+    
+    with driver.session() as session:
+        failure_modes = session.execute_read(get_failure_modes_with_context, failure_mode_ids)
+        stored_fingerprints = session.execute_read(get_embedding_fingerprints)
+        
+        grouped_failure_modes = group_by_failure_mode(failure_modes)
+        rows = []
+        changed_failure_modes = 0
+        for failure_mode_id, contexts in grouped_failure_modes.items():
+            fingerprint = failure_mode_fingerprint(contexts)
+            if stored_fingerprints.get(failure_mode_id) == [fingerprint]:
+                continue
+            changed_failure_modes += 1
+            for context in contexts:
+                rows.append({
+                    'failure_mode_id': failure_mode_id,
+                    'text_chunk': generate_failure_mode_text_chunk(context),
+                    'fingerprint': fingerprint
+                })
+        
+        print(f"{changed_failure_modes} of {len(grouped_failure_modes)} failure modes changed")
+        
+        # Keep all chunks of one failure mode in the same batch so the swap stays atomic per failure mode
+        batch = []
+        for row in rows:
+            if len(batch) >= batch_size and batch[-1]['failure_mode_id'] != row['failure_mode_id']:
+                session.execute_write(replace_vector_embedding_nodes, batch)
+                batch = []
+            batch.append(row)
+        if batch:
+            session.execute_write(replace_vector_embedding_nodes, batch)
+        
+        deleted = session.execute_write(delete_orphaned_vector_embeddings)
+        print(f"Removed {deleted} orphaned embedding nodes")
+    
+    driver.close()
+    
+    if rows:
+        embeddings = get_embeddings()
+        embed_vector_embedding_nodes(embeddings, batch_size=embed_batch_size, max_workers=max_workers)
+    
+    return changed_failure_modes
+
+def get_vector_embeddings_to_embed(tx, only_missing, label='VectorEmbedding'):
+    
+    query = f"""
+    MATCH (ve:{label})
+    WHERE ve.embedding IS NULL OR NOT $only_missing
+    RETURN elementId(ve) AS element_id, ve.text_chunk AS text_chunk
+    """
+    
+    return [record.data() for record in tx.run(query, only_missing=only_missing)]
+
+def get_compact_pca(label):
+    # The PCA of the label's compact index, None if compress_vector_embeddings was never run for it
+    return load_fitted_pca(compact_index_name(LABEL_VECTOR_INDEX_NAMES[label]))
+
+def build_embedding_write_rows(batch, vectors, pca=None):
+    # With a compact index in place, the projected copy is written with the full vector,
+    # so new and re-embedded chunks stay searchable in the compact index
+    rows = [{'element_id': row['element_id'], 'embedding': vector} for row, vector in zip(batch, vectors)]
+    if pca is not None:
+        for row, compact in zip(rows, project_vectors(pca, vectors)):
+            row['embedding_compact'] = compact.tolist()
+    return rows
+
+def write_embedding_batch(tx, rows):
+    
+    query = f"""
+    UNWIND $rows AS row
+    MATCH (ve)
+    WHERE elementId(ve) = row.element_id
+    CALL db.create.setNodeVectorProperty(ve, 'embedding', row.embedding)
+    WITH ve, row
+    WHERE row.embedding_compact IS NOT NULL
+    CALL db.create.setNodeVectorProperty(ve, '{COMPACT_EMBEDDING_PROPERTY}', row.embedding_compact)
+    """
+    
+    tx.run(query, rows=rows)
+
+def embed_vector_embedding_nodes(embeddings, batch_size=64, max_workers=4, only_missing=True, label='VectorEmbedding'):
+    # Embed text chunks in batches with bounded parallel requests and write vectors back with UNWIND
+    driver = GraphDatabase.driver(
+        uri=os.environ["NEO4J_URI"],
+        auth=(os.environ["NEO4J_USERNAME"], os.environ["NEO4J_PASSWORD"])
+    )
+    
+    with driver.session() as session:
+        pending = session.execute_read(get_vector_embeddings_to_embed, only_missing, label)
+        print(f"Found {len(pending)} text chunks to embed")
+        
+        batches = [pending[start:start + batch_size] for start in range(0, len(pending), batch_size)]
+        pca = get_compact_pca(label)
+        processed = 0
+        start_time = time.perf_counter()
+        
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="embedding") as executor:
+            futures = {
+                executor.submit(embeddings.embed_documents, [row['text_chunk'] for row in batch]): batch
+                for batch in batches
+            }
+            for future in as_completed(futures):
+                batch = futures[future]
+                session.execute_write(write_embedding_batch, build_embedding_write_rows(batch, future.result(), pca))
+                processed += len(batch)
+                elapsed = time.perf_counter() - start_time
+                print(f"Embedded {processed}/{len(pending)} chunks ({processed / elapsed:.1f} chunks/s)")
+    
+    driver.close()
+    elapsed = time.perf_counter() - start_time
+    if processed:
+        print(f"Embedding pipeline finished: {processed} chunks in {elapsed:.1f}s ({processed / elapsed:.1f} chunks/s)")
+    return processed
+
+def estimate_token_count(text):
+    # Words and punctuation marks, scaled up because WordPiece splits rare technical words into several pieces
+    return math.ceil(len(TOKEN_ESTIMATE_PATTERN.findall(text)) * TOKENS_PER_WORD)
+
+def get_token_splitter(max_tokens, tokenizer=None):
+    # mxbai-embed-large reads at most 512 tokens. The default estimate needs no download, so chunking works
+    # offline; 'tiktoken' counts cl100k_base tokens, which is not mxbai's tokenizer either and fetches its
+    # encoding on first use
+    tokenizer = tokenizer or CHUNK_TOKENIZER
+    if tokenizer == 'estimate':
+        return RecursiveCharacterTextSplitter(
+            chunk_size=max_tokens,
+            chunk_overlap=max_tokens // 10,
+            length_function=estimate_token_count
+        )
+    if tokenizer == 'tiktoken':
+        return RecursiveCharacterTextSplitter.from_tiktoken_encoder(
+            encoding_name="cl100k_base",
+            chunk_size=max_tokens,
+            chunk_overlap=max_tokens // 10
+        )
+    raise ValueError(f"Unknown chunk tokenizer '{tokenizer}', expected one of {CHUNK_TOKENIZERS}")
+
+def generate_granular_text_chunks(failure_mode_data):
+    # One chunk per failure-chain cause, per effect and per measure, phrased like the failure mode chunk
+    fm_name = failure_mode_data['failure_mode_name']
+    system_element = failure_mode_data['system_element_name']
+    location = (f"in the '{system_element}' component of the '{failure_mode_data['subsystem_name']}' subsystem "
+                f"in the '{failure_mode_data['product_name']}' system")
+    
+    chunks = []
+    for cause in failure_mode_data['causes']:
+        if not cause['cause_name']:
+            continue
+        cause_text = f"Failure cause '{cause['cause_name']}' of the failure mode '{fm_name}' {location}"
+        if cause['occurrence_rating']:
+            cause_text += f" with an occurrence rating of {cause['occurrence_rating']}"
+        if cause['detection_rating']:
+            cause_text += f" and a detection rating of {cause['detection_rating']}"
+        chunks.append(('cause', cause_text + "."))
+        
+        for measure in cause['preventive_measures']:
+            if measure:
+                chunks.append(('measure', f"Preventive measure '{measure}' for the failure cause '{cause['cause_name']}' "
+                                          f"of the failure mode '{fm_name}' {location}."))
+        for measure in cause['detective_measures']:
+            if measure:
+                chunks.append(('measure', f"Detective measure '{measure}' for detecting the failure cause '{cause['cause_name']}' "
+                                          f"in the context of failure mode '{fm_name}' {location}."))
+    
+    for effect in failure_mode_data['effects']:
+        if not effect['effect_name']:
+            continue
+        effect_text = f"The failure mode '{fm_name}' {location} results in the failure effect '{effect['effect_name']}'"
+        if effect['severity_rating']:
+            effect_text += f" with a severity rating of {effect['severity_rating']}"
+        chunks.append(('effect', effect_text + "."))
+    
+    return chunks
+
+def build_granular_chunk_rows(failure_modes, splitter):
+    rows = []
+    for failure_mode_id, contexts in group_by_failure_mode(failure_modes).items():
+        fingerprint = failure_mode_fingerprint(contexts)
+        # Causes, effects and measures repeat for every function the failure mode belongs to
+        seen = set()
+        for context in contexts:
+            for granularity, text in generate_granular_text_chunks(context):
+                for text_chunk in splitter.split_text(text):
+                    if (granularity, text_chunk) in seen:
+                        continue
+                    seen.add((granularity, text_chunk))
+                    rows.append({
+                        'failure_mode_id': failure_mode_id,
+                        'granularity': granularity,
+                        'text_chunk': text_chunk,
+                        'fingerprint': fingerprint
+                    })
+    return rows
+
+def get_granular_chunk_fingerprints(tx):
+    
+    query = """
+    MATCH (fm:FailureMode)-[:HAS_EMBEDDING]->(c)
+    WHERE c:FailureCauseChunk OR c:FailureEffectChunk OR c:MeasureChunk
+    RETURN fm.id AS failure_mode_id, collect(DISTINCT c.fingerprint) AS fingerprints
+    """
+    
+    return {record['failure_mode_id']: record['fingerprints'] for record in tx.run(query)}
+
+def replace_granular_chunk_nodes(tx, failure_mode_ids, rows):
+    
+    query = """
+    UNWIND $failure_mode_ids AS failure_mode_id
+    MATCH (:FailureMode {id: failure_mode_id})-[:HAS_EMBEDDING]->(old)
+    WHERE old:FailureCauseChunk OR old:FailureEffectChunk OR old:MeasureChunk
+    DETACH DELETE old
+    """
+    tx.run(query, failure_mode_ids=failure_mode_ids)
+    
+    for granularity, label in GRANULAR_CHUNK_LABELS.items():
+        query = f"""
+        UNWIND $rows AS row
+        MATCH (fm:FailureMode {{id: row.failure_mode_id}})
+        CREATE (c:{label} {{
+            failure_mode_id: row.failure_mode_id,
+            granularity: row.granularity,
+            text_chunk: row.text_chunk,
+            fingerprint: row.fingerprint
+        }})
+        CREATE (fm)-[:HAS_EMBEDDING]->(c)
+        """
+        tx.run(query, rows=[row for row in rows if row['granularity'] == granularity])
+
+def create_granular_embeddings(max_tokens=256, page_size=200, tokenizer=None):
+    # Writes per-cause, per-effect and per-measure chunks; unchanged failure modes are skipped by fingerprint
+    splitter = get_token_splitter(max_tokens, tokenizer)
+    driver = GraphDatabase.driver(
+        uri=os.environ["NEO4J_URI"],
+        auth=(os.environ["NEO4J_USERNAME"], os.environ["NEO4J_PASSWORD"])
+    )
+    
+    created = 0
+    with driver.session() as session:
+        stored_fingerprints = session.execute_read(get_granular_chunk_fingerprints)
+        for failure_modes in iter_failure_mode_context_pages(session, page_size):
+            rows = build_granular_chunk_rows(failure_modes, splitter)
+            fingerprints = {row['failure_mode_id']: row['fingerprint'] for row in rows}
+            changed_ids = [failure_mode_id for failure_mode_id in group_by_failure_mode(failure_modes)
+                           if stored_fingerprints.get(failure_mode_id) != [fingerprints.get(failure_mode_id)]]
+            if not changed_ids:
+                continue
+            changed_rows = [row for row in rows if row['failure_mode_id'] in set(changed_ids)]
+            session.execute_write(replace_granular_chunk_nodes, changed_ids, changed_rows)
+            created += len(changed_rows)
+            print(f"Created {created} granular chunks")
+        
+        for label in GRANULAR_CHUNK_LABELS.values():
+            session.execute_write(delete_orphaned_vector_embeddings, label)
+    
+    driver.close()
+    return created
+
+def create_granular_vector_indexes(batch_size=64, max_workers=4):
+    embeddings = get_embeddings()
+    
+    for granularity, label in GRANULAR_CHUNK_LABELS.items():
+        embed_vector_embedding_nodes(embeddings, batch_size=batch_size, max_workers=max_workers, label=label)
+        Neo4jVector.from_existing_graph(
+            embeddings,
+            search_type="vector",
+            node_label=label,
+            text_node_properties=["text_chunk"],
+            embedding_node_property="embedding",
+            index_name=VECTOR_INDEX_NAMES[granularity],
+        )
+        print(f"Vector index '{VECTOR_INDEX_NAMES[granularity]}' created successfully!")
+    
+    return True
+
+def create_vector_index(batch_size=64, max_workers=4):
     # Initialize embeddings
     # This is where I could set more parameters for the embeddings like: model='mxbai-embed-large' validate_model_on_init=False base_url=None client_kwargs={} async_client_kwargs={} sync_client_kwargs={} mirostat=None mirostat_eta=None mirostat_tau=None num_ctx=None num_gpu=None keep_alive=None num_thread=None repeat_last_n=None repeat_penalty=None temperature=None stop=None tfs_z=None top_k=None top_p=None
-    embeddings = OllamaEmbeddings(
-        model="mxbai-embed-large",
-        # Add other params as needed for production
-    )
+    # The backend (ollama or the offline hashing embedder) is chosen by FMEA_EMBEDDING_BACKEND;
+    # unchanged text chunks are served from the local embedding cache
+    embeddings = get_embeddings()
+    
+    # Compute the vectors ourselves so batch size and concurrency are under our control;
+    # from_existing_graph below only embeds nodes that are still missing an embedding
+    embed_vector_embedding_nodes(embeddings, batch_size=batch_size, max_workers=max_workers)
     
     # Create the actual vector index in Neo4j
     # This creates the index structure in the database
@@ -226,12 +723,7 @@ def create_fmea_fulltext_indexes():
     )
     
     def create_fulltext_index(tx):
-        query = '''
-        CREATE FULLTEXT INDEX `fulltext_entity_id` IF NOT EXISTS
-        FOR (n:SystemElement|Subsystem|FailureMode|Function|FailureCause|FailureEffect|Measure|Product) 
-        ON EACH [n.name]
-        '''
-        tx.run(query)
+        tx.run(SCHEMA_INDEXES['fulltext_entity_id'])
     
     try:
         with driver.session() as session:
@@ -250,18 +742,21 @@ def create_vector_embedding_fulltext_index():
         auth=(os.environ["NEO4J_USERNAME"], os.environ["NEO4J_PASSWORD"])
     )
     
-    def create_fulltext_index(tx):
-        query = '''
-        CREATE FULLTEXT INDEX `fulltext_vector_text_chunk` IF NOT EXISTS
-        FOR (n:VectorEmbedding) 
+    def create_fulltext_index(tx, index_name, label):
+        query = f'''
+        CREATE FULLTEXT INDEX `{index_name}` IF NOT EXISTS
+        FOR (n:{label}) 
         ON EACH [n.text_chunk]
         '''
         tx.run(query)
     
     try:
         with driver.session() as session:
-            session.execute_write(create_fulltext_index)
-            print("VectorEmbedding fulltext index created successfully.")
+            # The granular chunk labels get their own fulltext index for hybrid retrieval
+            for granularity, index_name in FULLTEXT_INDEX_NAMES.items():
+                label = GRANULAR_CHUNK_LABELS.get(granularity, "VectorEmbedding")
+                session.execute_write(create_fulltext_index, index_name, label)
+                print(f"{label} fulltext index created successfully.")
     except Exception as e:
         print(f"Index creation failed or already exists: {e}")
     finally:
@@ -0,0 +1,139 @@
+import os
+import json
+import math
+from neo4j import GraphDatabase
+from dataImport import data_upload_and_mapping_to_graph
+from graphQuery import (functions_query, failures_query, existing_measures_query, risk_ratings_query,
+                        qa_system_generation_query, lookup_params, batch_lookup_items)
+
+# The only budgets: record_db_hit_baseline profiles the reference dataset and writes the measured maxima plus
+# headroom here. There are no fallback numbers; re-record only together with the change that justifies it
+REFERENCE_DATASET = "data/EngineBlockCleaned.csv"
+DB_HIT_BASELINE_PATH = os.environ.get("FMEA_DB_HIT_BASELINE", "data/db_hit_baseline.json")
+DB_HIT_HEADROOM = 1.2
+
+# query name -> (query builder, {parameter: element context key})
+PROFILED_GRAPH_QUERIES = {
+    'functions': (functions_query, {'system_element': 'SystemElement'}),
+    'failures': (failures_query, {'function': 'Function'}),
+    'existing_measures': (existing_measures_query, {'failure_cause': 'FailureCause', 'failure_mode': 'FailureMode'}),
+    'risk_ratings': (risk_ratings_query, {'failure_cause': 'FailureCause', 'failure_mode': 'FailureMode',
+                                          'failure_effect': 'FailureEffect'}),
+}
+# query name -> (query builder, lookup parameter, element context key); profiled once over all sampled rows
+PROFILED_BATCH_QUERIES = {
+    'functions_batch': (functions_query, 'system_element', 'SystemElement'),
+    'failures_batch': (failures_query, 'function', 'Function'),
+}
+
+
+def total_db_hits(profile):
+    # Sums the db hits of every operator in a PROFILE plan tree
+    return profile.get('dbHits', 0) + sum(total_db_hits(child) for child in profile.get('children', []))
+
+def profile_query(session, query, params):
+    summary = session.run("PROFILE " + query, params).consume()
+    return total_db_hits(summary.profile)
+
+def sample_element_contexts(tx, sample_size):
+    # Complete failure chains of the reference dataset, in the shape the table rows have
+    query = """
+    MATCH (p:Product)-[:hasSubsystem]->(s:Subsystem)-[:hasSystemElement]->(se:SystemElement)
+          -[:hasFunction]->(f:Function)-[:hasFailureMode]->(fm:FailureMode)-[:isDueToFailureCause]->(fc:FailureCause),
+          (fm)-[:resultsInFailureEffect]->(fe:FailureEffect)
+    RETURN p.name AS Product, s.name AS Subsystem, se.name AS SystemElement, f.name AS Function,
+           fm.name AS FailureMode, fc.name AS FailureCause, fe.name AS FailureEffect
+    ORDER BY fm.id, fc.id, fe.id
+    LIMIT $sample_size
+    """
+    return [record.data() for record in tx.run(query, sample_size=sample_size)]
+
+def import_reference_dataset():
+    # Replaces the whole database with the reference dataset, so baseline and checks see the same graph
+    data_upload_and_mapping_to_graph(REFERENCE_DATASET, import_mode="bulk")
+
+def profile_graph_queries(session, contexts, lookup_mode=None):
+    # query name -> db hits of every sampled call
+    db_hits = {name: [] for name in list(PROFILED_GRAPH_QUERIES) + ['qa_system_structure', 'qa_entities']}
+    for name, (build_query, parameter, key) in PROFILED_BATCH_QUERIES.items():
+        items = batch_lookup_items([context[key] for context in contexts], parameter, lookup_mode)
+        db_hits[name] = [profile_query(session, build_query(lookup_mode, batched=True), {'items': items})]
+    for context in contexts:
+        for name, (build_query, parameters) in PROFILED_GRAPH_QUERIES.items():
+            params = lookup_params({parameter: context[key] for parameter, key in parameters.items()}, lookup_mode)
+            db_hits[name].append(profile_query(session, build_query(lookup_mode), params))
+
+        query, params = qa_system_generation_query({'Product': [context['Product']]}, lookup_mode)
+        db_hits['qa_system_structure'].append(profile_query(session, query, params))
+        query, params = qa_system_generation_query(
+            {'SystemElement': [context['SystemElement']], 'FailureMode': [context['FailureMode']]}, lookup_mode)
+        db_hits['qa_entities'].append(profile_query(session, query, params))
+    return db_hits
+
+def measure_db_hits(lookup_mode=None, sample_size=20):
+    # Returns (sampled contexts, query name -> db hits per call); no contexts if the graph has no complete chains
+    driver = GraphDatabase.driver(
+        uri=os.environ["NEO4J_URI"],
+        auth=(os.environ["NEO4J_USERNAME"], os.environ["NEO4J_PASSWORD"])
+    )
+    try:
+        with driver.session() as session:
+            contexts = session.execute_read(sample_element_contexts, sample_size)
+            if not contexts:
+                return contexts, {}
+            return contexts, profile_graph_queries(session, contexts, lookup_mode)
+    finally:
+        driver.close()
+
+def record_db_hit_baseline(path=DB_HIT_BASELINE_PATH, lookup_mode=None, sample_size=20, headroom=DB_HIT_HEADROOM):
+    # Run against the reference import; the budget of each query is its measured maximum plus headroom
+    contexts, db_hits = measure_db_hits(lookup_mode, sample_size)
+    if not contexts:
+        raise RuntimeError("no complete failure chains found, import the reference dataset first")
+
+    baseline = {
+        'lookup_mode': lookup_mode,
+        'sample_size': len(contexts),
+        'headroom': headroom,
+        'queries': {
+            name: {'max': max(hits), 'mean': sum(hits) / len(hits), 'budget': math.ceil(max(hits) * headroom)}
+            for name, hits in db_hits.items()
+        },
+    }
+    with open(path, 'w', encoding='utf-8') as baseline_file:
+        json.dump(baseline, baseline_file, indent=2)
+    print(f"Recorded db hit baseline of {len(contexts)} sampled rows to {path}")
+    return baseline
+
+def load_db_hit_budgets(path=DB_HIT_BASELINE_PATH):
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No db hit baseline at {path}; import {REFERENCE_DATASET} "
+                                f"(import_reference_dataset) and run record_db_hit_baseline")
+    with open(path, encoding='utf-8') as baseline_file:
+        baseline = json.load(baseline_file)
+    return {name: query['budget'] for name, query in baseline['queries'].items()}
+
+def find_budget_violations(db_hits, budgets, contexts):
+    # Queries over budget or without a recorded budget; empty if every query stays within its baseline
+    problems = []
+    for name, hits in db_hits.items():
+        budget = budgets.get(name)
+        if budget is None:
+            problems.append(f"{name}: no recorded budget, re-record the baseline")
+        elif max(hits) > budget:
+            worst = contexts[hits.index(max(hits))] if len(hits) == len(contexts) else "all sampled rows"
+            problems.append(f"{name}: {max(hits)} db hits exceed the budget of {budget} (context {worst})")
+    return problems
+
+def check_db_hit_budgets(budgets=None, lookup_mode=None, sample_size=20):
+    # Profiles every graph retrieval query on sampled rows; returns the problems, empty if all stay within budget
+    budgets = budgets or load_db_hit_budgets()
+    contexts, db_hits = measure_db_hits(lookup_mode, sample_size)
+    if not contexts:
+        return ["no complete failure chains found, import the reference dataset first"]
+
+    print(f"{'query':<22} {'max':>8} {'mean':>10} {'budget':>8}")
+    for name, hits in db_hits.items():
+        budget = budgets.get(name)
+        print(f"{name:<22} {max(hits):>8} {sum(hits) / len(hits):>10.1f} {budget if budget is not None else '-':>8}")
+    return find_budget_violations(db_hits, budgets, contexts)
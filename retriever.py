@@ -1,33 +1,227 @@
 
-from langchain_ollama import OllamaEmbeddings
 from langchain_community.vectorstores import Neo4jVector
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStoreRetriever
+from embeddingBackend import get_embeddings
+from embeddingCache import embed_queries
+import os
+import atexit
+import threading
+from neo4j import GraphDatabase
+from indexAndEmbeddingCreation import GRANULAR_CHUNK_LABELS, VECTOR_INDEX_NAMES, FULLTEXT_INDEX_NAMES
+from embeddingCompression import COMPACT_EMBEDDING_PROPERTY, ProjectedEmbeddings, CompactRetriever, compact_index_name, load_pca, metadata_projection
+from annIndex import get_ann_retriever
+from hybridRetriever import HybridRetriever
 
-def get_retriever(amountResults):
+RETRIEVAL_BACKENDS = ('neo4j', 'ann')
+SEARCH_TYPES = ('vector', 'hybrid')
+
+
+class SharedDriverGraph:
+    # Neo4jVector only needs _driver and _database from a graph object; this hands it the service's driver
+    def __init__(self, driver, database):
+        self._driver = driver
+        self._database = database
+
+
+class RetrievalService:
+    # Process-wide: one Neo4j driver, one embeddings client (and its HTTP pool), one vector store per index.
+    # Retrievers handed out are cheap views with their own k.
+
+    def __init__(self):
+        self._driver = None
+        self._embeddings = None
+        self._vector_stores = {}
+        self._lock = threading.Lock()
+
+    @property
+    def driver(self):
+        with self._lock:
+            if self._driver is None:
+                self._driver = GraphDatabase.driver(
+                    uri=os.environ["NEO4J_URI"],
+                    auth=(os.environ["NEO4J_USERNAME"], os.environ["NEO4J_PASSWORD"])
+                )
+            return self._driver
+
+    @property
+    def database(self):
+        return os.environ.get("NEO4J_DATABASE", "neo4j")
+
+    @property
+    def embeddings(self):
+        # Initialize the same embeddings configuration as the index; query embeddings are looked up in the local cache first
+        with self._lock:
+            if self._embeddings is None:
+                self._embeddings = get_embeddings()
+            return self._embeddings
+
+    def _index_embeddings(self, index_name, compact):
+        embedding_node_property = "embedding"
+        embeddings = self.embeddings
+        if compact:
+            # Search the PCA-reduced index written by compress_vector_embeddings
+            index_name = compact_index_name(index_name)
+            embeddings = ProjectedEmbeddings(embeddings, load_pca(index_name))
+            embedding_node_property = COMPACT_EMBEDDING_PROPERTY
+        return index_name, embeddings, embedding_node_property
+
+    def vector_store(self, granularity='failure_mode', compact=False):
+        # from_existing_index reads the index metadata, so it runs once per index and process
+        key = (granularity, compact)
+        if key not in self._vector_stores:
+            index_name, embeddings, embedding_node_property = self._index_embeddings(VECTOR_INDEX_NAMES[granularity], compact)
+            graph = SharedDriverGraph(self.driver, self.database)
+            
+            # Connect to existing index 
+            #vector_store = Neo4jVector.from_existing_index(
+                #embeddings,
+                #search_type="hybrid",
+                #index_name="failure_mode_context_index",
+                #keyword_index_name="failure_mode_keyword_index")
+
+            # Only use vector search
+            vector_store = Neo4jVector.from_existing_index(
+                embeddings,
+                search_type="vector",
+                node_label=GRANULAR_CHUNK_LABELS.get(granularity, "VectorEmbedding"), 
+                index_name=index_name,
+                embedding_node_property=embedding_node_property,
+                graph=graph,
+                retrieval_query=f"""
+                RETURN node.text_chunk AS text, score, {metadata_projection('node')} AS metadata
+                """
+            )
+            with self._lock:
+                self._vector_stores.setdefault(key, vector_store)
+        return self._vector_stores[key]
+
+    def get_retriever(self, k, granularity='failure_mode', compact=False, backend='neo4j', search_type='vector', **hybrid_options):
+        if backend not in RETRIEVAL_BACKENDS:
+            raise ValueError(f"Unknown retrieval backend '{backend}', expected one of {RETRIEVAL_BACKENDS}")
+        if search_type not in SEARCH_TYPES:
+            raise ValueError(f"Unknown search type '{search_type}', expected one of {SEARCH_TYPES}")
+        
+        if backend == 'ann':
+            # In-process search over the snapshot written by build_ann_snapshot, no database round trip
+            if compact or search_type != 'vector':
+                raise ValueError("The ann backend only supports plain vector search; ANN snapshots are quantized on build")
+            return get_ann_retriever(self.embeddings, VECTOR_INDEX_NAMES[granularity], k=k)
+        
+        if search_type == 'hybrid':
+            # Fulltext hits on exact component and cause names fused with the vector hits (weights, thresholds via hybrid_options)
+            index_name, embeddings, _ = self._index_embeddings(VECTOR_INDEX_NAMES[granularity], compact)
+            return HybridRetriever(
+                driver=self.driver,
+                embeddings=embeddings,
+                vector_index_name=index_name,
+                fulltext_index_name=FULLTEXT_INDEX_NAMES[granularity],
+                database=self.database,
+                k=k,
+                **hybrid_options
+            )
+        
+        if compact:
+            # Candidates from the compact index, ranked by the full vectors
+            index_name = compact_index_name(VECTOR_INDEX_NAMES[granularity])
+            return CompactRetriever(
+                driver=self.driver,
+                embeddings=self.embeddings,
+                pca=load_pca(index_name),
+                index_name=index_name,
+                database=self.database,
+                k=k
+            )
+        
+        return self.vector_store(granularity, compact).as_retriever(search_kwargs={"k": k})
+
+    def close(self):
+        with self._lock:
+            if self._driver is not None:
+                self._driver.close()
+            self._driver = None
+            self._vector_stores = {}
+
+
+_retrieval_service = None
+
+def get_retrieval_service():
+    global _retrieval_service
+    if _retrieval_service is None:
+        _retrieval_service = RetrievalService()
+        atexit.register(_retrieval_service.close)
+    return _retrieval_service
+
+def get_retriever(amountResults, granularity='failure_mode', compact=False, backend='neo4j', search_type='vector', **hybrid_options):
+    # Every pipeline stage shares the process-wide service, so setup is paid once per run
+    return get_retrieval_service().get_retriever(amountResults, granularity, compact, backend, search_type, **hybrid_options)
+
+def get_granular_retrievers(amountResults, backend='neo4j', search_type='vector'):
+    # One retriever per chunk granularity, so each query can target the chunks that match it
+    return {granularity: get_retriever(amountResults, granularity, backend=backend, search_type=search_type)
+            for granularity in VECTOR_INDEX_NAMES}
+
+def select_retriever(retriever, granularity):
+    # Accepts a single retriever or the dict from get_granular_retrievers
+    if isinstance(retriever, dict):
+        return retriever.get(granularity, retriever['failure_mode'])
+    return retriever
+
+def vector_store_batch_search(vector_store, queries, k):
+    # All queries are embedded in one request and searched with one UNWIND over the vector index
+    vectors = embed_queries(vector_store.embedding, queries)
     
-    # Initialize the same embeddings configuration
-    embeddings = OllamaEmbeddings(
-        model="mxbai-embed-large",
-    )
+    query = f"""
+    UNWIND range(0, size($vectors) - 1) AS query_index
+    CALL {{
+        WITH query_index
+        CALL db.index.vector.queryNodes($index_name, $k, $vectors[query_index])
+        YIELD node, score
+        {vector_store.retrieval_query}
+    }}
+    RETURN query_index, text, score, metadata
+    ORDER BY query_index, score DESC
+    """
     
-    # Connect to existing index 
-    #vector_store = Neo4jVector.from_existing_index(
-        #embeddings,
-        #search_type="hybrid",
-        #index_name="failure_mode_context_index",
-        #keyword_index_name="failure_mode_keyword_index")
-
-    # Only use vector search
-    vector_store = Neo4jVector.from_existing_index(
-        embeddings,
-        search_type="vector",
-        node_label="VectorEmbedding", 
-        index_name="failure_mode_context_index",
-        retrieval_query="""
-        RETURN node.text_chunk AS text, score, node {.*, text_chunk: Null, embedding: Null, id: Null} AS metadata
-        """
+    records, _, _ = vector_store._driver.execute_query(
+        query, vectors=vectors, index_name=vector_store.index_name, k=k,
+        database_=vector_store._database, routing_='r'
     )
+    results = [[] for _ in queries]
+    for record in records:
+        # Same Document shape Neo4jVector returns, without null metadata values
+        metadata = {key: value for key, value in record['metadata'].items() if value is not None}
+        results[record['query_index']].append(Document(page_content=record['text'], metadata=metadata))
+    return results
+
+def batch_retrieve(retriever, queries):
+    # queries: [(granularity, query), ...]; returns one document list per query, in order.
+    # Queries are grouped by the retriever they resolve to, so a single retriever serves every granularity
+    # in one round trip; Neo4j vector retrievers are batched, other retrievers fall back to invoke.
+    results = [None] * len(queries)
+    groups = {}
+    for position, (granularity, query) in enumerate(queries):
+        selected = select_retriever(retriever, granularity)
+        groups.setdefault(id(selected), (selected, []))[1].append(position)
     
-    return vector_store.as_retriever(search_kwargs={"k": amountResults})
+    for selected, positions in groups.values():
+        texts = [queries[position][1] for position in positions]
+        if isinstance(selected, VectorStoreRetriever) and isinstance(selected.vectorstore, Neo4jVector):
+            documents = vector_store_batch_search(selected.vectorstore, texts, selected.search_kwargs.get('k', 4))
+        else:
+            documents = [selected.invoke(text) for text in texts]
+        for position, docs in zip(positions, documents):
+            results[position] = docs
+    return results
+
+def dedupe_documents(documents):
+    seen_content = set()
+    unique_results = []
+    for doc in documents:
+        if doc.page_content not in seen_content:
+            unique_results.append(doc)
+            seen_content.add(doc.page_content)
+    return unique_results
 
 def retrieve_functions_from_vector(element_context: dict, retriever, debug):
     product = element_context.get('Product')
@@ -36,7 +230,7 @@ def retrieve_functions_from_vector(element_context: dict, retriever, debug):
 
     query = f"Functions of {system_element}"
 
-    results = retriever.invoke(query)
+    results = select_retriever(retriever, 'failure_mode').invoke(query)
     if debug:
         print(f"Vector retrieval results for query '{query}': {results}")
     return results
@@ -47,7 +241,7 @@ def retrieve_failures_from_vector(element_context: dict, retriever, debug):
 
     query = f"Failure Modes of Function {function} with failure effects and failure causes"
 
-    results = retriever.invoke(query)
+    results = select_retriever(retriever, 'failure_mode').invoke(query)
     if debug:
         print(f"Vector retrieval results for query '{query}': {results}")
     return results
@@ -59,49 +253,36 @@ def retrieve_existing_measures_from_vector(element_context: dict, retriever, deb
     query_detective = f"Detective Measures for Failure cause {failure_cause}"
     query_preventive = f"Preventive Measures for Failure cause {failure_cause} in the context of failure mode {failure_mode}"
 
-    results_detective = retriever.invoke(query_detective)
-    results_preventive = retriever.invoke(query_preventive)
+    results_detective, results_preventive = batch_retrieve(
+        retriever, [('measure', query_detective), ('measure', query_preventive)]
+    )
 
     all_results.extend(results_detective)
     all_results.extend(results_preventive)
-
-    seen_content = set()
-    unique_results = []
-    for doc in all_results:
-        if doc.page_content not in seen_content:
-            unique_results.append(doc)
-            seen_content.add(doc.page_content)
     
-    return unique_results
+    return dedupe_documents(all_results)
 
 def retrieve_risk_ratings_from_vector(element_context: dict, retriever, debug):
     # Construct a query based on the element context
     failure_mode = element_context.get('FailureMode')
     failure_cause = element_context.get('FailureCause')
     failure_effect = element_context.get('FailureEffect')
-    all_results = []
+    queries = {}
     
     # failure cause
     if failure_cause:
-        cause_query_occurrence = f"Occurrence of failure cause {failure_cause}"
-        cause_results_occurrence = retriever.invoke(cause_query_occurrence)
-        cause_query_detection = f"Detection of failure cause {failure_cause} in the context of failure mode {failure_mode}"
-        cause_results_detection = retriever.invoke(cause_query_detection)
-
-        all_results.extend(cause_results_detection)
-        all_results.extend(cause_results_occurrence)
+        queries['cause_occurrence'] = ('cause', f"Occurrence of failure cause {failure_cause}")
+        queries['cause_detection'] = ('cause', f"Detection of failure cause {failure_cause} in the context of failure mode {failure_mode}")
     
     # failure effect 
     if failure_effect:
-        effect_query = f"Severity of failure effect {failure_effect}"
-        effect_results = retriever.invoke(effect_query)
-        all_results.extend(effect_results)
+        queries['effect'] = ('effect', f"Severity of failure effect {failure_effect}")
     
-    seen_content = set()
-    unique_results = []
-    for doc in all_results:
-        if doc.page_content not in seen_content:
-            unique_results.append(doc)
-            seen_content.add(doc.page_content)
+    # One embedding request and one vector query per granularity instead of one round trip per query
+    results = dict(zip(queries, batch_retrieve(retriever, list(queries.values()))))
+    all_results = []
+    all_results.extend(results.get('cause_detection', []))
+    all_results.extend(results.get('cause_occurrence', []))
+    all_results.extend(results.get('effect', []))
     
-    return unique_results
\ No newline at end of file
+    return dedupe_documents(all_results)
\ No newline at end of file
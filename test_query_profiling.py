@@ -0,0 +1,30 @@
+import os
+import pytest
+from queryProfiling import (DB_HIT_BASELINE_PATH, import_reference_dataset, load_db_hit_budgets, measure_db_hits,
+                            find_budget_violations)
+
+# PROFILE db-hit budgets of the graph retrieval queries on the reference dataset. The import replaces the whole
+# database, so besides NEO4J_URI the test needs FMEA_PROFILE_RESET_DATABASE=1 to run
+pytestmark = [
+    pytest.mark.skipif("NEO4J_URI" not in os.environ, reason="NEO4J_URI is not set"),
+    pytest.mark.skipif(os.environ.get("FMEA_PROFILE_RESET_DATABASE") != "1",
+                       reason="imports the reference dataset over the whole database; set FMEA_PROFILE_RESET_DATABASE=1"),
+]
+
+
+@pytest.fixture(scope="module")
+def profiled_db_hits():
+    import_reference_dataset()
+    contexts, db_hits = measure_db_hits()
+    assert contexts, "the reference import produced no complete failure chains"
+    return contexts, db_hits
+
+
+def test_baseline_is_recorded():
+    assert os.path.exists(DB_HIT_BASELINE_PATH), \
+        f"no db hit baseline at {DB_HIT_BASELINE_PATH}, record it with queryProfiling.record_db_hit_baseline"
+
+
+def test_queries_stay_within_db_hit_budgets(profiled_db_hits):
+    contexts, db_hits = profiled_db_hits
+    assert find_budget_violations(db_hits, load_db_hit_budgets(), contexts) == []
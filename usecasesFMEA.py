@@ -1,6 +1,6 @@
 from retriever import get_retriever, retrieve_functions_from_vector, retrieve_failures_from_vector, retrieve_existing_measures_from_vector, retrieve_risk_ratings_from_vector
 from entityExtraction import extract_entities_from_question, extract_system_elements, extract_system_elements_with_functions, extract_failure_chains, extract_failure_chains_with_risk_ratings
-from graphQuery import retrieve_existing_measures_from_graph, retrieve_qa_system_generation_data, retrieve_functions_from_graph, retrieve_failures_from_graph, retrieve_risk_ratings_from_graph
+from graphQuery import retrieve_existing_measures_from_graph, retrieve_qa_system_generation_data, retrieve_functions_from_graph_batch, retrieve_failures_from_graph_batch, retrieve_risk_ratings_from_graph
 from outputGeneration import generate_answer_system_structure, generate_functions, generate_failures, generate_existing_measures, generate_risk_rating, generate_risk_rating_async, generate_new_measures
 from misc import comprehensive_retriever, add_functions_to_table_structure, add_failure_modes_to_table_structure, add_existing_measures_to_table_structure, add_risk_rating_to_table_structure, add_new_measures_to_table_structure
 import csv
@@ -41,12 +41,14 @@ def function_generation(llm, graph, current_table_structure, debug):
     csv_log_data = []
     # rag retrieval for each system element
     table_structure_with_functions = []
+    # graph query for all system elements in one round trip
+    graph_contexts = retrieve_functions_from_graph_batch(
+        system_structure_list, graph, debug = True
+    )
     for element_context in system_structure_list:
         
         # graph query
-        graph_context = retrieve_functions_from_graph(
-            element_context, graph, debug = True
-        )
+        graph_context = graph_contexts.get(element_context.get('SystemElement'), [])
         
         # vector query
 
@@ -79,11 +81,12 @@ def failure_generation(llm, graph, current_table_structure, debug):
     csv_log_data = []
 
     table_structure_with_failures = []
+    graph_contexts = retrieve_failures_from_graph_batch(
+        functions_list, graph, debug = False
+    )
     for function_context in functions_list:
          
-        graph_context = retrieve_failures_from_graph(
-            function_context, graph, debug = False
-        )
+        graph_context = graph_contexts.get(function_context.get('Function'), [])
         
     
         vector_context = retrieve_failures_from_vector(